@@ -15,14 +15,25 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
+import json
+import os
+from functools import wraps
 from urllib.parse import quote, urlsplit
 
-from flask import Flask, Response, redirect, request, send_from_directory
+from flask import (
+    Flask, Response, jsonify, redirect, request, send_from_directory
+)
+from werkzeug.exceptions import NotFound
 
+import responsecache
+from prerender import PAGES, page_path
+from responsecache import cached
 from settings import config
+from sink import now
+from suggest import MAX_SUGGESTIONS, SUGGESTIONS, suggestion_index
 from voidhtml import (
-    build_log as build_log_page,
-    find, lists_index, longest_names, main_page, metapackages,
+    AGO_PLACEHOLDER, build_log as build_log_page,
+    fill_ago, find, lists_index, longest_names, main_page, metapackages,
     newest, no_page, of_day, opensearch_description,
     page_generator, popular, which_package
 )
@@ -37,12 +48,33 @@ def search():
     term = request.args.get('term')
     finding = request.args.get('find')
     fields = request.args.getlist('by')
-    if finding or fields or not term:
-        return find(term, fields)
+    page = request.args.get('page', type=int)
+    if finding or fields or page or not term:
+        return find(term, fields, max(page or 1, 1))
     term = quote(term)
     return redirect(config.ROOT_URL + '/package/' + term + '/')
 
 
+@app.route('/api/suggest')
+def suggestions():
+    '''Returns names and descriptions of packages matching beginning
+    of typed name, in OpenSearch suggestions format.'''
+    query = request.args.get('q', '')
+    limit = request.args.get('limit', SUGGESTIONS, type=int)
+    found = suggestion_index().suggest(
+        query,
+        max(1, min(limit, MAX_SUGGESTIONS))
+    )
+    return Response(
+        response=json.dumps([
+            query,
+            [pkgname for pkgname, _ in found],
+            [description or '' for _, description in found],
+        ]),
+        content_type='application/x-suggestions+json'
+    )
+
+
 @app.route('/all/')
 def list_all_():
     return send_from_directory(config.GENERATED_FILES_PATH, 'all.html')
@@ -54,26 +86,66 @@ def source_tarball():
     return send_from_directory(directory, 'pkgs.void.tar.bz2')
 
 
-app.route('/')(main_page)
+def prerendered(view):
+    '''Serves page written by prerender.py, if any, instead of view.'''
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        try:
+            return send_from_directory(
+                os.path.join(config.GENERATED_FILES_PATH, PAGES),
+                page_path(request.path)
+            )
+        except NotFound:
+            return view(*args, **kwargs)
+    return wrapper
+
+
+def _cached_with_ago(view, variant=None):
+    '''Like cached, but caches view rendered with placeholder of time
+    passed since database update, filled when page is served.'''
+    @wraps(view)
+    def with_placeholder(*args, **kwargs):
+        return view(*args, ago=AGO_PLACEHOLDER, **kwargs)
+    cached_view = cached(with_placeholder, variant)
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        return fill_ago(cached_view(*args, **kwargs))
+    return wrapper
+
+
+def _today():
+    return now().date()
+
+
+app.route('/')(_cached_with_ago(main_page, _today))
 app.route('/toc/')(lists_index)
 app.route('/of_day/')(of_day)
-app.route('/newest/')(newest)
-app.route('/sets/')(metapackages)
-app.route('/popular/')(popular)
-app.route('/longest_names/')(longest_names)
+app.route('/newest/')(_cached_with_ago(newest))
+app.route('/sets/')(prerendered(cached(metapackages)))
+app.route('/popular/')(prerendered(cached(popular)))
+app.route('/longest_names/')(prerendered(cached(longest_names)))
 app.route('/package/')(which_package)
 
 
 @app.route('/package/<pkgname>/')
+@prerendered
+@cached
 def package(pkgname):
     return page_generator(pkgname)
 
 
 @app.route('/package/<pkgname>/<iset>-<libc>/')
+@cached
 def package_arch(pkgname, iset, libc):
     return page_generator(pkgname, single=join_arch(iset, libc))
 
 
+@app.route('/stats/cache.json')
+def cache_stats():
+    return jsonify(responsecache.cache.stats())
+
+
 @app.route('/buildlog/<pkgname>/<iset>-<libc>/<version>/')
 def build_log(pkgname, iset, libc, version):
     result = build_log_page(pkgname, join_arch(iset, libc), version)
@@ -15,12 +15,21 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
+import argparse
+import base64
+import hashlib
 import sys
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
+from itertools import islice
+from multiprocessing import Queue
+from queue import Empty
 from sink import now
 
 import datasource
-from repopaths import index_path, load_repo
+from settings import config
+from repopaths import index_path, load_repo, stream_repo
 from thirdparty import plistop
 
 _OFFSETS = {
@@ -47,45 +56,268 @@ def parse_date(string):
     return result
 
 
-def to_std_types(plist):
-    if isinstance(plist, bytes):
-        return plist.decode()
-    if isinstance(plist, plistop.PListArray):
-        return [to_std_types(i) for i in plist]
-    if isinstance(plist, plistop.PListDict):
-        return {k: to_std_types(plist[k]) for k in plist}
-    return plist
+_REPODATA_TYPES = {
+    **plistop.PLAIN_TYPES,
+    'data': lambda elem: base64.b64decode(elem.text.encode()).decode(),
+}
+
+
+def _tree_packages(path):
+    repodata = load_repo(path)
+    if repodata is None:
+        return
+    for pkgname, pkgdict in repodata.iteritems():
+        yield pkgname, pkgdict.to_dict(_REPODATA_TYPES)
+
+
+def _stream_packages(path):
+    packages = stream_repo(path, _REPODATA_TYPES)
+    if packages is None:
+        return
+    yield from packages
+
+
+INGESTERS = {
+    'tree': _tree_packages,
+    'stream': _stream_packages,
+}
+
+
+def package_rows(repo, ingest='tree', path=None):
+    if path is None:
+        path = index_path(repo)
+    arch = repo.rpartition('/')[-1]
+    for pkgname, dictionary in INGESTERS[ingest](path):
+        if 'build-date' in dictionary:
+            dictionary['build-date'] = parse_date(dictionary['build-date'])
+        depends_count = len(dictionary.get('run_depends', []))
+        mainpkg = dictionary.get('source-revisions', pkgname).split(':')[0]
+        yield datasource.PackageRow(
+            arch=arch,
+            pkgname=pkgname,
+            pkgver=dictionary['pkgver'],
+            builddate=dictionary.get('build-date', ''),
+            repodata=dictionary,
+            mainpkg=mainpkg,
+            depends_count=depends_count,
+            repo=repo
+        )
+
+
+# Count of chunks of rows parsed by worker ahead of storing them
+_QUEUED_CHUNKS = 4
+# Queues of chunks of rows of repos, by number of repo, in worker
+_queues = []
+
+
+def _set_queues(queues):
+    _queues[:] = queues
+
+
+def _queue_rows(number, repo, ingest, path):
+    '''Puts rows of repo into its queue in chunks, then None.'''
+    queue = _queues[number]
+    try:
+        rows = package_rows(repo, ingest, path)
+        while chunk := list(islice(rows, config.INSERT_CHUNK_SIZE)):
+            queue.put(chunk)
+    finally:
+        queue.put(None)
+
+
+def _discard_queued(queue, future):
+    '''Reads chunks until last one, so worker is not blocked on full
+    queue, or until worker is gone without putting it.'''
+    while True:
+        try:
+            if queue.get(timeout=0.1) is None:
+                return
+        except Empty:
+            if future.done():
+                return
+
+
+def _repos_rows(repos, ingest, jobs):
+    '''Yields pairs of repo and iterator of its rows, in order of repos.
+    Rows not read before next pair is requested are skipped.
 
+    With jobs > 1, repos are parsed in that many worker processes, which
+    pass rows in chunks through queues of bounded length. Memory holds
+    at most few chunks per worker instead of whole repos, but worker
+    waits until rows of previous repos are read.'''
+    if jobs <= 1:
+        for repo in repos:
+            yield repo, package_rows(repo, ingest)
+        return
+    queues = [Queue(_QUEUED_CHUNKS) for _ in repos]
+    with ProcessPoolExecutor(
+            jobs, initializer=_set_queues, initargs=(queues,)) as executor:
+        pending = [
+            (repo, queue, executor.submit(
+                _queue_rows, number, repo, ingest, index_path(repo)
+            ))
+            for number, (repo, queue) in enumerate(zip(repos, queues))
+        ]
 
-def build_db(source, repos):
+        def queued_rows(queue, future):
+            while (chunk := queue.get()) is not None:
+                yield from chunk
+            pending.pop(0)
+            future.result()
+
+        try:
+            while pending:
+                repo, queue, future = pending[0]
+                rows = queued_rows(queue, future)
+                yield repo, rows
+                for _ in rows:
+                    pass
+        finally:
+            for _, queue, future in pending:
+                if not future.cancel():
+                    _discard_queued(queue, future)
+
+
+def index_hash(repo):
+    '''Returns hash of contents of index of repo, or None if it is absent.'''
+    digest = hashlib.sha256()
+    try:
+        with open(index_path(repo), 'rb') as index:
+            while chunk := index.read(1 << 20):
+                digest.update(chunk)
+    except FileNotFoundError:
+        return None
+    return digest.hexdigest()
+
+
+def _hash_key(repo):
+    return f'repodata_hash:{repo}'
+
+
+_DATES_KEY = 'daily_dates'
+
+
+def unchanged_repos(previous, hashes):
+    '''Returns repos having index same as when previous was built.'''
+    return {
+        repo
+        for repo, digest in hashes.items()
+        if digest and next(previous.auxiliary(_hash_key(repo)), None) == digest
+    }
+
+
+def build_db(source, repos, ingest='tree', jobs=1, incremental=False):
+    # pylint: disable=too-many-arguments
     today = now().date()
     tomorrow = today + timedelta(days=1)
+    dates = [today, tomorrow]
+    hashes = {repo: index_hash(repo) for repo in repos}
+    unchanged = set()
+    previous = datasource.existing() if incremental else None
+    if previous is not None:
+        unchanged = unchanged_repos(previous, hashes)
+    parsed = _repos_rows(
+        [repo for repo in repos if repo not in unchanged],
+        ingest,
+        jobs
+    )
     for repo in repos:
-        path = index_path(repo)
-        repodata = load_repo(path)
-        if repodata is None:
-            continue
-        arch = repo.rpartition('/')[-1]
-        for pkgname, pkgdict in repodata.iteritems():
-            dictionary = {}
-            for k, v in pkgdict.iteritems():
-                if k == 'build-date':
-                    dictionary[k] = parse_date(v)
-                else:
-                    dictionary[k] = to_std_types(v)
-            depends_count = len(dictionary.get('run_depends', []))
-            mainpkg = dictionary.get('source-revisions', pkgname).split(':')[0]
-            source.create(datasource.PackageRow(
-                arch=arch,
-                pkgname=pkgname,
-                pkgver=dictionary['pkgver'],
-                builddate=dictionary.get('build-date', ''),
-                repodata=dictionary,
-                mainpkg=mainpkg,
-                depends_count=depends_count,
-                repo=repo
-            ), dates=[today, tomorrow])
+        if repo in unchanged:
+            source.copy_repo(previous, repo, dates)
+        else:
+            _, rows = next(parsed)
+            source.create_many(rows, dates)
+        if hashes[repo]:
+            source.add_auxiliary(_hash_key(repo), hashes[repo])
+    parsed.close()
+    print(
+        f'builddb: {len(unchanged)} of {len(repos)} repositories unchanged',
+        file=sys.stderr
+    )
+
+
+def apply_delta(source, repos, ingest='tree', jobs=1):
+    '''Changes packages of repos in source to match their indices.
+    Repos with missing index are left as they are.'''
+    today = now().date()
+    tomorrow = today + timedelta(days=1)
+    dates = [today, tomorrow]
+    hashes = {repo: index_hash(repo) for repo in repos}
+    unchanged = set()
+    if next(source.auxiliary(_DATES_KEY), None) == today.isoformat():
+        unchanged = unchanged_repos(source, hashes)
+    changed = [
+        repo
+        for repo in repos
+        if hashes[repo] and repo not in unchanged
+    ]
+    counts = Counter()
+    for repo, rows in _repos_rows(changed, ingest, jobs):
+        counts.update(source.replace_repo(repo, rows, dates))
+        source.set_auxiliary(_hash_key(repo), hashes[repo])
+    source.set_auxiliary(_DATES_KEY, today.isoformat())
+    print(
+        'builddb: {inserted} inserted, {updated} updated, {deleted} deleted'
+        ' packages in {repos} of {all_repos} repositories'.format(
+            inserted=counts['inserted'],
+            updated=counts['updated'],
+            deleted=counts['deleted'],
+            repos=len(changed),
+            all_repos=len(repos)
+        ),
+        file=sys.stderr
+    )
+
+
+def parse_args(args):
+    parser = argparse.ArgumentParser(
+        description='Loads repository indices into database.'
+    )
+    parser.add_argument(
+        '--ingest',
+        choices=INGESTERS,
+        default='tree',
+        help='tree parses whole index at once, '
+        'stream parses it package by package using less memory'
+    )
+    parser.add_argument(
+        '--jobs', '-j',
+        type=int,
+        default=1,
+        help='count of repositories parsed in parallel'
+    )
+    parser.add_argument(
+        '--incremental',
+        action='store_true',
+        help='copy packages of repositories with unchanged index '
+        'from current database instead of parsing index'
+    )
+    parser.add_argument(
+        '--delta',
+        action='store_true',
+        help='change current database in place, only where packages '
+        'differ from indices; implies --incremental'
+    )
+    parser.add_argument('repos', nargs='*')
+    return parser.parse_args(args)
+
+
+def main(*args):
+    arguments = parse_args(args)
+    if arguments.delta:
+        datasource.delta(
+            lambda x: apply_delta(
+                x, arguments.repos, arguments.ingest, arguments.jobs
+            )
+        )
+        return
+    datasource.update(
+        lambda x: build_db(
+            x, arguments.repos, arguments.ingest, arguments.jobs,
+            arguments.incremental
+        )
+    )
 
 
 if __name__ == '__main__':
-    datasource.update(lambda x: build_db(x, sys.argv[1:]))
+    main(*sys.argv[1:])
@@ -13,11 +13,20 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
+# pylint: disable=too-many-lines
+
 import abc
 import datetime
 import hashlib
+import os
+import re
 import sqlite3
-from collections import namedtuple
+import threading
+from collections import Counter, defaultdict, namedtuple
+from contextlib import closing
+from functools import lru_cache
+from itertools import islice
+from urllib.parse import quote
 
 import ujson as json
 
@@ -81,6 +90,9 @@ class PackageRow(_PackageRow):
         fields = {f: function_locals[f] for f in _PackageRow._fields}
         return super().__new__(cls, **fields)
 
+    def __reduce__(self):
+        return (PackageRow.from_record, (tuple(self),))
+
     @staticmethod
     def from_record(record):
         return PackageRow(**dict(zip(_PackageRow._fields, record)))
@@ -133,7 +145,219 @@ def daily_hash(pkgname, date, bits=None):
     return binary[:bits]
 
 
+_INSERT_PACKAGE = 'INSERT INTO packages ({}) VALUES ({})'.format(
+    ', '.join(PackageRow._fields),
+    ', '.join('?' * len(PackageRow._fields))
+)
+
+
+# Prepared statements kept by each connection
+_CACHED_STATEMENTS = 256
+
+
+def _criteria(names):
+    '''Returns names of fields among names, in canonical order,
+    so same queries are built for any order of arguments.'''
+    return tuple(sorted(i for i in names if i in PackageRow._fields))
+
+
+@lru_cache(maxsize=None)
+def _read_query(fixed):
+    return 'SELECT {} FROM packages WHERE {}'.format(
+        ', '.join(PackageRow._fields),
+        ' AND '.join(f'{i} = ?' for i in fixed) or True
+    )
+
+
+@lru_cache(maxsize=None)
+def _exists_query(fixed):
+    return 'SELECT 1 FROM packages WHERE {} LIMIT 1'.format(
+        ' AND '.join(f'{i} = ?' for i in fixed) or True
+    )
+
+
+@lru_cache(maxsize=None)
+def _update_query(updated, fixed):
+    return 'UPDATE packages SET {} WHERE {}'.format(
+        ', '.join(f'{i} = ?' for i in updated),
+        ' AND '.join(f'{i} = ?' for i in fixed) or True
+    )
+
+
+def _fts5_available():
+    with closing(sqlite3.connect(':memory:')) as probe:
+        try:
+            probe.execute('create virtual table probe using fts5(text)')
+        except sqlite3.OperationalError:
+            return False
+    return True
+
+
+# Full text search module of newly created search_terms
+_SEARCH_MODULE = 'fts5' if _fts5_available() else 'fts4'
+# Options of search_terms: only index is stored, with one document
+# per pkgname, of rowid of pkgnames, and prefixes of type-ahead queries
+_SEARCH_OPTIONS = {
+    'fts5': "content='', tokenize='porter', prefix='2 3'",
+    'fts4': "content='', tokenize=porter",
+}
+# bm25 weights of name, description and homepage
+_SEARCH_WEIGHTS = '10.0, 2.0, 1.0'
+# Description of package of pkgnames row, preferably from repository
+_PKGNAME_DESCRIPTION = '''(
+    select short_desc
+    from packages
+    join package_properties on package = packages.rowid
+    where packages.pkgname = pkgnames.pkgname
+    order by repo = '', repo, arch
+    limit 1
+)'''
+
+
+def _fts5_query(term, fields):
+    '''Returns FTS5 query of term limited to fields. Words other than
+    operators and plain words, optionally with prefix star, are quoted,
+    so package names like void-docs or gtk+3 are searched as phrases.'''
+    words = []
+    for word in term.split():
+        if word in ('AND', 'OR', 'NOT') or re.fullmatch(r'\w+\*?', word):
+            words.append(word)
+            continue
+        star = '*' if word.endswith('*') else ''
+        phrase = word[:len(word) - len(star)].replace('"', '""')
+        words.append(f'"{phrase}"{star}')
+    return '{{{}}} : ({})'.format(' '.join(fields), ' '.join(words))
+
+
+def _is_search_syntax_error(error):
+    '''Returns whether error is caused by full text query of user,
+    not by database.'''
+    return str(error).startswith((
+        'fts5: syntax error',
+        'malformed MATCH expression',
+        'unknown special query',
+    ))
+
+
+def query_cache_info():
+    '''Returns counts of hits and misses of cache of built queries.'''
+    infos = [
+        query.cache_info()
+        for query in (_read_query, _exists_query, _update_query)
+    ]
+    return {
+        'hits': sum(i.hits for i in infos),
+        'misses': sum(i.misses for i in infos),
+    }
+
+
+_INSERT_DAILY_HASH = '''INSERT OR IGNORE INTO daily_hash (pkgname, date)
+    VALUES (?, ?)'''
+
+
+_COPIED_PACKAGES = '''SELECT pkgname, pkgver, arch, 0,
+        coalesce(json_extract(repodata, '$."build-date"'), ''),
+        repodata, '{}', mainpkg, depends_count, '', repo, 0
+    FROM previous.packages
+    WHERE repo = ?'''
+
+
+_COPY_PACKAGES = 'INSERT INTO packages ({}) {}'.format(
+    ', '.join(PackageRow._fields),
+    _COPIED_PACKAGES
+)
+
+
+_INSERT_METAPACKAGE = '''INSERT OR IGNORE INTO metapackages
+    (pkgname, classification)
+    VALUES (?, ?)'''
+
+
+# Properties of repodata and templatedata stored apart from them,
+# so they are read without decoding whole json
+PROPERTIES = (
+    'short_desc',
+    'homepage',
+    'license',
+    'maintainer',
+    'changelog',
+    'build-options',
+    'build-date',
+    'installed_size',
+)
+
+
+# Properties having list of values, stored as json arrays, so page
+# decodes only lists it shows
+LIST_PROPERTIES = (
+    'distfiles',
+    'conflicts',
+    'provides',
+    'reverts',
+    'shlib-provides',
+    'run_depends',
+)
+
+
+_PROPERTY_TYPES = {
+    'installed_size': 'integer',
+}
+
+
+def _column(name):
+    return name.replace('-', '_')
+
+
+def _property_source(name):
+    '''Returns sql expression of json holding property, where
+    repodata takes precedence over templatedata.'''
+    return (
+        f'''case when json_type(repodata, '$."{name}"') is null '''
+        'then templatedata else repodata end'
+    )
+
+
+# Columns of PackageRow, with repodata and templatedata left empty
+_PROPERTY_ROW_COLUMNS = tuple(
+    f"'{{}}' as {i}" if i in ('repodata', 'templatedata') else i
+    for i in PackageRow._fields
+)
+
+
+_READ_PROPERTIES = '''select {}, {}
+    from packages
+    join package_properties on package = packages.rowid
+    where pkgname = ?'''.format(
+    ', '.join(_PROPERTY_ROW_COLUMNS),
+    ', '.join(_column(i) for i in PROPERTIES + LIST_PROPERTIES)
+)
+
+
+# Indexes of queries of SqliteDataSource, covering where possible
+_INDEXES = {
+    'packages_pkgname_idx': 'packages (pkgname, pkgver, arch)',
+    'packages_repo_idx': 'packages (repo, pkgname, arch)',
+    'packages_pkgver_idx': 'packages (pkgver, repo)',
+    'packages_builddate_idx': 'packages (builddate desc, pkgname, repo)',
+    'packages_popularity_idx': 'packages (popularity desc, pkgname)',
+    'packages_name_length_idx':
+        'packages (length(pkgname) desc, pkgname, repo)',
+    'daily_hash_idx': 'daily_hash (date, pkgname)',
+    'group_idx': 'pkgnames (same_template, pkgname)',
+}
+
+
+# Indexes created by previous versions, replaced by _INDEXES
+_OBSOLETE_INDEXES = (
+    'pkgname_idx',
+    'pkgver_idx',
+    'builddate_idx',
+    'popularity_idx',
+)
+
+
 class Datasource(metaclass=abc.ABCMeta):
+    # pylint: disable=too-many-public-methods
     @abc.abstractmethod
     def __enter__(self):
         '''Enters runtime context.'''
@@ -142,15 +366,46 @@ class Datasource(metaclass=abc.ABCMeta):
     def __exit__(self, exc_type, exc_val, exc_tb):
         '''Exits runtime context.'''
 
+    @abc.abstractmethod
+    def close(self):
+        '''Releases resources without committing.'''
+
+    @abc.abstractmethod
+    def replaced(self):
+        '''Returns whether underlying data was replaced by other
+        since datasource was opened.'''
+
     @abc.abstractmethod
     def create(self, package_row, dates):
         '''Saves information about package into database.
         Computes if it is daily package, and register if so.'''
 
+    @abc.abstractmethod
+    def create_many(self, package_rows, dates):
+        '''Saves information about packages into database, like create,
+        but in batches.'''
+
+    @abc.abstractmethod
+    def copy_repo(self, previous, repo, dates):
+        '''Copies packages of repo from previous datasource, as they were
+        read from repository index, and registers them like create.'''
+
+    @abc.abstractmethod
+    def replace_repo(self, repo, package_rows, dates):
+        '''Makes packages of repo same as package_rows, changing only
+        packages that differ by pkgver or repodata, keeping other values
+        of changed ones. Returns Counter of inserted, updated and deleted.'''
+
     @abc.abstractmethod
     def read(self, **kwargs):
         '''Finds packages that match criteria passed as keyword arguments.'''
 
+    @abc.abstractmethod
+    def read_properties(self, pkgname):
+        '''Finds packages named pkgname. Returns iterator of pairs
+        of package, without repodata and templatedata, and dictionary
+        of its PROPERTIES and LIST_PROPERTIES.'''
+
     @abc.abstractmethod
     def exists(self, **kwargs):
         '''Finds whether packages that match criteria
@@ -164,21 +419,39 @@ class Datasource(metaclass=abc.ABCMeta):
     def list_all(self):
         '''Returns list of all packages.'''
 
+    @abc.abstractmethod
+    def page_digests(self):
+        '''Returns digests of data shown on page of each pkgname,
+        by pkgname.'''
+
+    @abc.abstractmethod
+    def suggestions(self):
+        '''Returns tuples of pkgname, description and popularity
+        of all pkgnames.'''
+
     @staticmethod
     @abc.abstractmethod
     def search_fields():
         '''Returns names of searchable fields'''
 
     @abc.abstractmethod
-    def search(self, term, fields):
+    def search(self, term, fields, limit=None, offset=0):
         '''Searches for packages described by term.
-        Returns iterator of dictionaries with keys 'name', 'description'.'''
+        Returns iterator of dictionaries with keys 'name', 'description',
+        best matching first, at most limit of them, skipping offset first,
+        or message if term is not valid query.'''
 
     @abc.abstractmethod
     def update(self, **kwargs):
         '''Finds packages matching criteria passed as keyword arguments
         and sets values passed as keyword arguments prefixed with 'set_'.'''
 
+    @abc.abstractmethod
+    def update_many(self, keys, values, rows, **kwargs):
+        '''Sets fields named by values of packages having fields named by
+        keys equal to row, for every row consisting of keys and values.
+        Packages are limited by criteria passed as keyword arguments.'''
+
     @abc.abstractmethod
     def of_day(self, date):
         '''Returns different packages every day.'''
@@ -206,6 +479,10 @@ class Datasource(metaclass=abc.ABCMeta):
     def add_auxiliary(self, key, value):
         '''Sets auxiliary values of _key_.'''
 
+    @abc.abstractmethod
+    def set_auxiliary(self, key, value):
+        '''Replaces auxiliary values of _key_ with single value.'''
+
     @abc.abstractmethod
     def auxiliary(self, key):
         '''Returns auxiliary values of _key_.'''
@@ -216,19 +493,71 @@ class Datasource(metaclass=abc.ABCMeta):
 
 
 class SqliteDataSource(Datasource):
+    # pylint: disable=too-many-public-methods
     def __init__(self, path, mode):
         '''Opens datasource stored as sqlite database.
         path: path of database file
-        mode: 'read' or 'write'
+        mode: 'read', 'write', 'bulk' or 'delta'; write and bulk fill
+            search terms and properties once, in finish_creating; bulk
+            writes database that is discarded on failure, so trades
+            durability for speed; delta changes existing database in single
+            transaction, in write-ahead log mode, so readers see it whole
+            before or after change, refreshes properties of changed
+            packages only and search terms of all; database returns to
+            rollback journal mode after commit, if no reader keeps it open
         '''
-        self._db = sqlite3.connect(path)
+        self.path = path
+        self._identity = _file_identity(path)
+        if mode == 'read':
+            self._db = sqlite3.connect(
+                f'file:{quote(path)}?mode=ro',
+                uri=True,
+                cached_statements=_CACHED_STATEMENTS
+            )
+        else:
+            self._db = sqlite3.connect(
+                path,
+                cached_statements=_CACHED_STATEMENTS
+            )
         self._cursor = self._db.cursor()
-        if mode == 'write':
+        self._mode = mode
+        self._stale = set()
+        if mode == 'read':
+            self._set_read_pragmas()
+        if mode == 'bulk':
+            self._set_bulk_pragmas()
+        if mode == 'delta':
+            self._cursor.execute('pragma journal_mode = wal')
+            self._cursor.execute('begin immediate')
+        if mode in ('write', 'bulk', 'delta'):
             self._initialize()
             self.metadata_interest = MetapackageInterest()
 
+    def _set_read_pragmas(self):
+        self._cursor.execute('pragma mmap_size = 268435456')
+        self._cursor.execute('pragma cache_size = -32768')
+
+    def replaced(self):
+        '''Returns whether underlying data was replaced by other
+        since datasource was opened.'''
+        identity = _file_identity(self.path)
+        return identity is not None and identity != self._identity
+
+    def close(self):
+        '''Releases resources without committing.'''
+        self._db.close()
+
+    def _set_bulk_pragmas(self):
+        self._cursor.execute('pragma journal_mode = memory')
+        self._cursor.execute('pragma synchronous = off')
+        self._cursor.execute('pragma cache_size = -262144')
+        self._cursor.execute('pragma temp_store = memory')
+        # not of previous database attached by copy_repo, still read
+        self._cursor.execute('pragma main.locking_mode = exclusive')
+
     def _initialize(self):
         self._cursor.execute('''create table if not exists packages (
+            id integer primary key,
             arch text not null,
             pkgname text not null,
             pkgver text not null,
@@ -242,6 +571,16 @@ class SqliteDataSource(Datasource):
             repo text not null,
             popularity integer default 0)
             ''')
+        self._cursor.execute('''create table if not exists
+            package_properties (
+            package integer primary key,
+            {}
+            )
+            '''.format(',\n'.join([
+            *(f'{_column(i)} {_PROPERTY_TYPES.get(i, "text")}'
+              for i in PROPERTIES),
+            *(f'{_column(i)} text' for i in LIST_PROPERTIES),
+        ])))
         self._cursor.execute('''create table if not exists daily_hash (
             pkgname text not null,
             date text not null,
@@ -262,12 +601,28 @@ class SqliteDataSource(Datasource):
         self._cursor.execute('''create table if not exists auxiliary
             as select ? as key, ? as value
             ''', ['update_time', time])
+        if self._mode == 'delta':
+            self._cursor.execute(
+                'select exists(select 1 from package_properties)'
+            )
+            if not self._cursor.fetchone()[0]:
+                self._stale.add('properties')
+            if self._search_module() is None:
+                self._cursor.execute('drop table if exists search_terms')
+                self._stale.add('search_terms')
+        self._create_search_terms()
+
+    def _create_search_terms(self):
         self._cursor.execute('''create virtual table if not exists
-            search_terms using fts4(
+            search_terms using {}(
             {},
-            tokenize=porter
+            {}
             )
-            '''.format(', '.join(self.search_fields())))
+            '''.format(
+                _SEARCH_MODULE,
+                ', '.join(self.search_fields()),
+                _SEARCH_OPTIONS[_SEARCH_MODULE]
+            ))
 
     def __enter__(self):
         return self
@@ -275,88 +630,228 @@ class SqliteDataSource(Datasource):
     def __exit__(self, exc_type, exc_val, exc_tb):
         if exc_type is None:
             self._db.commit()
+            if self._mode == 'delta':
+                self._leave_wal()
         self._db.close()
 
+    def _leave_wal(self):
+        '''Moves changes from write-ahead log into database, so database
+        file replacing it later is not mixed with them, and returns to
+        rollback journal mode unless readers keep database open.'''
+        self._cursor.execute('pragma wal_checkpoint(truncate)')
+        busy, _, _ = self._cursor.fetchone()
+        if busy:
+            raise sqlite3.OperationalError(
+                f'write-ahead log of {self.path} not checkpointed'
+            )
+        try:
+            self._cursor.execute('pragma journal_mode = delete')
+            self._cursor.fetchall()
+        except sqlite3.OperationalError as error:
+            if str(error) != 'database is locked':
+                raise
+
     def create(self, package_row, dates):
         '''Saves information about package into database.
         Computes if it is daily package, and register if so.'''
-        query = 'INSERT INTO packages ({}) VALUES ({})'.format(
-            ', '.join(PackageRow._fields),
-            ', '.join('?' * len(PackageRow._fields))
+        self.create_many([package_row], dates)
+
+    def create_many(self, package_rows, dates, chunk_size=None):
+        '''Saves information about packages into database, like create,
+        but in batches of chunk_size rows.'''
+        if chunk_size is None:
+            chunk_size = config.INSERT_CHUNK_SIZE
+        date_hashes = [(date, daily_hash('', date)) for date in dates]
+        package_rows = iter(package_rows)
+        while True:
+            chunk = list(islice(package_rows, chunk_size))
+            if not chunk:
+                break
+            self._create_chunk(chunk, date_hashes)
+
+    def _create_chunk(self, package_rows, date_hashes):
+        self._cursor.executemany(_INSERT_PACKAGE, package_rows)
+        self._add_package_data(package_rows, date_hashes)
+
+    def _add_package_data(self, package_rows, date_hashes):
+        self._stale.update(('pkgnames', 'search_terms'))
+        if self._mode == 'delta':
+            self._fill_properties(to_json(sorted({
+                package_row.pkgname
+                for package_row in package_rows
+            })))
+        else:
+            self._stale.add('properties')
+        self._cursor.executemany(_INSERT_DAILY_HASH, [
+            daily
+            for package_row in package_rows
+            for daily in self._daily_hashes(package_row, date_hashes)
+        ])
+        self._cursor.executemany(_INSERT_METAPACKAGE, [
+            metapackage
+            for package_row in package_rows
+            for metapackage in self._metapackage(package_row)
+        ])
+
+    def copy_repo(self, previous, repo, dates):
+        '''Copies packages of repo from previous datasource, as they were
+        read from repository index, and registers them like create.'''
+        self._cursor.execute('pragma database_list')
+        if 'previous' not in (i[1] for i in self._cursor.fetchall()):
+            self._cursor.execute(
+                'attach database ? as previous',
+                [previous.path]
+            )
+        self._cursor.execute(_COPY_PACKAGES, [repo])
+        # rows in new database are not indexed yet in bulk mode,
+        # so derived data is computed from indexed previous one
+        self._cursor.execute(_COPIED_PACKAGES, [repo])
+        package_rows = list(map(PackageRow._make, self._cursor.fetchall()))
+        date_hashes = [(date, daily_hash('', date)) for date in dates]
+        self._add_package_data(package_rows, date_hashes)
+
+    def replace_repo(self, repo, package_rows, dates):
+        '''Makes packages of repo same as package_rows, changing only
+        packages that differ by pkgver or repodata, keeping other values
+        of changed ones. Returns Counter of inserted, updated and deleted.'''
+        package_rows = list(package_rows)
+        self._cursor.execute('''select pkgname, arch, pkgver, repodata
+            from packages
+            where repo = ?
+            ''', [repo])
+        current = {
+            (pkgname, arch): (pkgver, repodata)
+            for pkgname, arch, pkgver, repodata in self._cursor.fetchall()
+        }
+        inserted = []
+        updated = []
+        for package_row in package_rows:
+            key = (package_row.pkgname, package_row.arch)
+            previous = current.pop(key, None)
+            if previous is None:
+                inserted.append(package_row)
+            elif previous != (package_row.pkgver, package_row.repodata):
+                updated.append(package_row)
+        deleted = [(repo, pkgname, arch) for pkgname, arch in current]
+        self._cursor.executemany('''delete from package_properties
+            where package = (
+                select rowid from packages
+                where repo = ? and pkgname = ? and arch = ?
+            )
+            ''', deleted)
+        self._cursor.executemany('''delete from packages
+            where repo = ? and pkgname = ? and arch = ?
+            ''', deleted)
+        self._cursor.executemany('''update packages
+            set pkgver = ?, builddate = ?, repodata = ?,
+                mainpkg = ?, depends_count = ?
+            where repo = ? and pkgname = ? and arch = ?
+            ''', [
+            (
+                row.pkgver, row.builddate, row.repodata,
+                row.mainpkg, row.depends_count,
+                repo, row.pkgname, row.arch
+            )
+            for row in updated
+        ])
+        self.create_many(inserted, dates)
+        if current or updated:
+            self._stale.add('pkgnames')
+        date_hashes = [(date, daily_hash('', date)) for date in dates]
+        self._cursor.executemany(_INSERT_DAILY_HASH, [
+            daily
+            for package_row in package_rows
+            for daily in self._daily_hashes(package_row, date_hashes)
+        ])
+        self._refresh_package_data(
+            {pkgname for pkgname, _ in current}
+            | {row.pkgname for row in inserted + updated}
         )
-        self._cursor.execute(query, package_row)
-        self._add_search_terms(package_row)
-        self._add_daily_hashes(package_row, dates)
-        self._register_metapackage(package_row)
-
-    def _add_search_terms(self, package_row):
-        for data in (package_row.repodata, package_row.templatedata):
-            self._add_search_terms_from_data(package_row.pkgname, data)
-
-    def _add_search_terms_from_data(self, pkgname, data):
-        data = from_json(data)
-        if not data:
-            return
-        query = 'INSERT INTO search_terms ({}) VALUES ({})'.format(
-            ', '.join(self.search_fields()),
-            ', '.join('?' * len(self.search_fields()))
+        return Counter(
+            inserted=len(inserted),
+            updated=len(updated),
+            deleted=len(current)
         )
-        self._cursor.execute(query, (
-            pkgname,
-            data.get('short_desc'),
-            data.get('homepage'),
-            ))
 
-    def _add_daily_hashes(self, package_row, dates):
+    def _refresh_package_data(self, pkgnames):
+        names = to_json(sorted(pkgnames))
+        if pkgnames:
+            self._stale.add('search_terms')
+        self._fill_properties(names)
+        self._cursor.execute('''delete from metapackages
+            where pkgname in (select value from json_each(?))
+            ''', [names])
+        self._cursor.execute('''delete from daily_hash
+            where pkgname in (select value from json_each(?))
+            and pkgname not in (select pkgname from packages)
+            ''', [names])
+        self._cursor.executemany(_INSERT_METAPACKAGE, [
+            metapackage
+            for pkgname in pkgnames
+            for package_row in self.read(pkgname=pkgname)
+            for metapackage in self._metapackage(package_row)
+        ])
+
+    @staticmethod
+    def _daily_hashes(package_row, date_hashes):
         if not dailyable(package_row):
             return
-        hash_query = '''INSERT OR IGNORE INTO daily_hash (pkgname, date)
-            VALUES (?, ?)'''
-        for date in dates:
+        for date, date_hash in date_hashes:
             hash_value = daily_hash(
                 package_row.pkgname,
                 date,
                 config.DAILY_HASH_BITS
             )
-            if daily_hash('', date).startswith(hash_value):
-                self._cursor.execute(
-                    hash_query,
-                    (package_row.pkgname, _date_as_string(date))
-                )
+            if date_hash.startswith(hash_value):
+                yield (package_row.pkgname, _date_as_string(date))
 
-    def _register_metapackage(self, package_row):
+    def _metapackage(self, package_row):
         pkgname = package_row.pkgname
         repodata = package_row.repodata
         if (package_row.depends_count
                 and package_row.depends_count > 1
                 and not pkgname.endswith('-32bit')
                 and from_json(repodata).get('installed_size') == 0):
-            query = '''INSERT OR IGNORE INTO metapackages
-                (pkgname, classification)
-                VALUES (?, ?)'''
-            self._cursor.execute(
-                query,
-                [pkgname, self.metadata_interest.get(pkgname).value]
-            )
+            yield (pkgname, self.metadata_interest.get(pkgname).value)
 
     def read(self, **kwargs):
         '''Finds packages that match criteria passed as keyword arguments.'''
-        fixed = [i for i in kwargs if i in PackageRow._fields]
-        query = 'SELECT {} FROM packages WHERE {}'.format(
-            ', '.join(PackageRow._fields),
-            ' AND '.join(f'{i} = ?' for i in fixed)
+        fixed = _criteria(kwargs)
+        self._cursor.execute(
+            _read_query(fixed),
+            [kwargs[i] for i in fixed]
         )
-        self._cursor.execute(query, [kwargs[i] for i in fixed])
         return (PackageRow.from_record(x) for x in self._cursor.fetchall())
 
+    def read_properties(self, pkgname):
+        '''Finds packages named pkgname. Returns iterator of pairs
+        of package, without repodata and templatedata, and dictionary
+        of its PROPERTIES and LIST_PROPERTIES.'''
+        self._cursor.execute(_READ_PROPERTIES, [pkgname])
+        fields = len(_PROPERTY_ROW_COLUMNS)
+        scalars = fields + len(PROPERTIES)
+        for record in self._cursor.fetchall():
+            row = PackageRow._make(record[:fields])
+            properties = {
+                name: value
+                for name, value in zip(PROPERTIES, record[fields:scalars])
+                if value is not None
+            }
+            properties.update(
+                (name, from_json(value))
+                for name, value in zip(LIST_PROPERTIES, record[scalars:])
+                if value is not None
+            )
+            yield row, properties
+
     def exists(self, **kwargs):
         '''Finds whether packages that match criteria
         passed as keyword arguments exists.'''
-        fixed = [i for i in kwargs if i in PackageRow._fields]
-        query = 'SELECT 1 FROM packages WHERE {} LIMIT 1'.format(
-            ' AND '.join(f'{i} = ?' for i in fixed)
+        fixed = _criteria(kwargs)
+        self._cursor.execute(
+            _exists_query(fixed),
+            [kwargs[i] for i in fixed]
         )
-        self._cursor.execute(query, [kwargs[i] for i in fixed])
         return bool(self._cursor.fetchall())
 
     def same_template(self, pkgname):
@@ -380,6 +875,46 @@ class SqliteDataSource(Datasource):
         self._cursor.execute(query)
         return (PackageRow.from_record(x) for x in self._cursor.fetchall())
 
+    def page_digests(self):
+        '''Returns digests of data shown on page of each pkgname,
+        by pkgname.'''
+        self._cursor.execute('''select pkgname, same_template
+            from pkgnames
+            ''')
+        same_template = defaultdict(list)
+        templates = {}
+        for pkgname, template in self._cursor.fetchall():
+            same_template[template].append(pkgname)
+            templates[pkgname] = template
+        digests = {}
+        self._cursor.execute('''select {}
+            from packages
+            order by pkgname, repo, arch
+            '''.format(', '.join(PackageRow._fields)))
+        for record in self._cursor:
+            pkgname = record[PackageRow._fields.index('pkgname')]
+            if pkgname not in digests:
+                digests[pkgname] = hashlib.sha256(repr(sorted(
+                    same_template[templates.get(pkgname)]
+                )).encode())
+            digests[pkgname].update(repr(record).encode())
+        return {
+            pkgname: digest.hexdigest()
+            for pkgname, digest in digests.items()
+        }
+
+    def suggestions(self):
+        '''Returns tuples of pkgname, description and popularity
+        of all pkgnames.'''
+        self._cursor.execute(f'''select pkgname, {_PKGNAME_DESCRIPTION}, (
+                select max(popularity)
+                from packages
+                where packages.pkgname = pkgnames.pkgname
+            )
+            from pkgnames
+            ''')
+        return self._cursor.fetchall()
+
     @staticmethod
     def search_fields():
         '''Returns names of searchable fields'''
@@ -389,21 +924,53 @@ class SqliteDataSource(Datasource):
             'homepage',
             )
 
-    def search(self, term, fields):
+    def _search_module(self):
+        '''Returns full text search module of search_terms,
+        or None if it is absent or stores documents.'''
+        self._cursor.execute('''select sql from sqlite_master
+            where name = 'search_terms'
+            ''')
+        row = self._cursor.fetchone()
+        if row is None or "content=''" not in row[0]:
+            return None
+        return 'fts5' if 'using fts5' in row[0] else 'fts4'
+
+    def search(self, term, fields, limit=None, offset=0):
         '''Searches for packages described by term.
-        Returns iterator of dictionaries with keys 'name', 'description'.'''
-        effective_fields = (
-            set(self.search_fields()).intersection(fields)
-            or self.search_fields()
-        )
-        query = '''select distinct name, description from search_terms
-            where {}
-            order by name'''.format(
-                ' or '.join(f'{f} match ?' for f in effective_fields)
-            )
+        Returns iterator of dictionaries with keys 'name', 'description',
+        best matching first, at most limit of them, skipping offset first,
+        or message if term is not valid query.'''
+        effective_fields = [
+            i for i in self.search_fields() if i in fields
+        ] or self.search_fields()
+        if self._search_module() == 'fts5':
+            if not (term or '').split():
+                return iter(())
+            matches = '''search_terms
+                join pkgnames on pkgnames.rowid = search_terms.rowid
+                where search_terms match ?'''
+            order = f'bm25(search_terms, {_SEARCH_WEIGHTS}), pkgnames.pkgname'
+            arguments = [_fts5_query(term, effective_fields)]
+        else:
+            matches = '''pkgnames
+                where rowid in (select docid from search_terms where {})
+                '''.format(
+                    ' or '.join(f'{f} match ?' for f in effective_fields)
+                )
+            order = 'pkgnames.pkgname'
+            arguments = [term] * len(effective_fields)
+        # Each document of search_terms indexes one pkgname, of same rowid,
+        # and is ranked by bm25 with fts5; fts4 ranks none, so names order
+        query = f'''select pkgnames.pkgname, {_PKGNAME_DESCRIPTION}
+            from {matches}
+            order by {order}
+            limit ? offset ?'''
+        arguments += [-1 if limit is None else limit, offset]
         try:
-            self._cursor.execute(query, [term]*len(effective_fields))
-        except sqlite3.OperationalError:
+            self._cursor.execute(query, arguments)
+        except sqlite3.OperationalError as error:
+            if not _is_search_syntax_error(error):
+                raise
             return 'Invalid search term'
         keys = ('name', 'description')
         return (dict(zip(keys, vals)) for vals in self._cursor.fetchall())
@@ -417,26 +984,62 @@ class SqliteDataSource(Datasource):
 
     def update(self, **kwargs):
         '''Finds packages matching criteria passed as keyword arguments
-        and sets values passed as keyword arguments prefixed with 'set_'.
-
-        NOTE: update of search_terms is done only for usage
-        existing at the time of writing, that is adding templatedata
-        '''
-        updated = [i for i in kwargs if self._sets(i) in PackageRow._fields]
-        fixed = [
-            i
-            for i in kwargs
-            if not self._sets(i) and i in PackageRow._fields
-        ]
-        query = 'UPDATE packages SET {} WHERE {}'.format(
-            ', '.join('{} = ?'.format(self._sets(i)) for i in updated),
-            ' AND '.join('{} = ?'.format(i) for i in fixed) or True
+        and sets values passed as keyword arguments prefixed with 'set_'.'''
+        updated = _criteria(self._sets(i) for i in kwargs)
+        fixed = _criteria(kwargs)
+        self._cursor.execute(
+            _update_query(updated, fixed),
+            [kwargs[f'set_{i}'] for i in updated]
+            + [kwargs[i] for i in fixed]
         )
-        self._cursor.execute(query, [kwargs[i] for i in updated + fixed])
         pkgname = kwargs.get('pkgname')
-        templatedata = kwargs.get('set_templatedata')
-        if pkgname and templatedata:
-            self._add_search_terms_from_data(pkgname, templatedata)
+        if {'set_pkgname', 'set_mainpkg'}.intersection(kwargs):
+            self._stale.add('pkgnames')
+        if {'set_pkgname', 'set_repodata', 'set_templatedata'}.intersection(
+                kwargs):
+            self._stale.add('search_terms')
+        if {'set_repodata', 'set_templatedata'}.intersection(kwargs):
+            if pkgname and self._mode == 'delta':
+                self._fill_properties(to_json([pkgname]))
+            else:
+                self._stale.add('properties')
+
+    def update_many(self, keys, values, rows, **kwargs):
+        '''Sets fields named by values of packages having fields named by
+        keys equal to row, for every row consisting of keys and values.
+        Packages are limited by criteria passed as keyword arguments.
+
+        Rows are loaded into temporary table and applied by single
+        joined update. For rows of repeated keys any of them is used.
+        '''
+        columns = [*keys, *values]
+        fixed = [i for i in kwargs if i in PackageRow._fields]
+        self._cursor.execute('drop table if exists temp.staging')
+        self._cursor.execute('create temp table staging ({})'.format(
+            ', '.join(columns)
+        ))
+        self._cursor.executemany(
+            'insert into temp.staging values ({})'.format(
+                ', '.join('?' * len(columns))
+            ),
+            rows
+        )
+        self._cursor.execute(
+            'create index temp.staging_idx on staging ({})'.format(
+                ', '.join(keys)
+            )
+        )
+        query = '''UPDATE packages SET {}
+            FROM temp.staging
+            WHERE {}'''.format(
+            ', '.join(f'{i} = staging.{i}' for i in values),
+            ' AND '.join([
+                *(f'packages.{i} = staging.{i}' for i in keys),
+                *(f'packages.{i} = ?' for i in fixed)
+            ])
+        )
+        self._cursor.execute(query, [kwargs[i] for i in fixed])
+        self._cursor.execute('drop table temp.staging')
 
     def of_day(self, date):
         '''Returns different packages every day'''
@@ -503,21 +1106,22 @@ class SqliteDataSource(Datasource):
     def longest_names(self, at_most):
         '''Finds names of packages having name longer than
         at_most-th longest-name-bearing package'''
-        query = (
-            'select distinct pkgname from packages '
-            'where repo not like "multilib%" '
+        shown = (
+            'repo not like "multilib%" '
             'and pkgname not like "%-devel" '
             'and pkgname not like "%-dbg" '
-            'and length(pkgname) > ('
-            '  select length(pkgname) from ('
-            '    select distinct pkgname '
-            '    from packages '
-            '    where repo not like "multilib%" '
-            '    and pkgname not like "%-devel" '
-            '    and pkgname not like "%-dbg" '
+        )
+        query = (
+            'select pkgname from ('
+            '  select distinct length(pkgname), pkgname from packages '
+            '  where ' + shown +
+            '  and length(pkgname) > ('
+            '    select length(pkgname) from packages '
+            '    where ' + shown +
+            '    group by length(pkgname), pkgname '
+            '    order by length(pkgname) desc '
+            '    limit 1 offset ?'
             '  )'
-            '  order by length(pkgname) desc'
-            '  limit 1 offset ?'
             ')'
             'order by pkgname'
         )
@@ -532,6 +1136,11 @@ class SqliteDataSource(Datasource):
         )
         self._cursor.execute(query, [key, value])
 
+    def set_auxiliary(self, key, value):
+        '''Replaces auxiliary values of _key_ with single value.'''
+        self._cursor.execute('delete from auxiliary where key = ?', [key])
+        self.add_auxiliary(key, value)
+
     def auxiliary(self, key):
         '''Returns auxiliary values of _key_.'''
         query = (
@@ -541,50 +1150,113 @@ class SqliteDataSource(Datasource):
         self._cursor.execute(query, [key])
         return (x[0] for x in self._cursor.fetchall())
 
-    def finish_creating(self):
+    def _fill_search_terms(self):
+        '''Indexes texts of all packages, as single document
+        for each pkgname.'''
+        self._cursor.execute('drop table if exists search_terms')
+        self._create_search_terms()
         self._cursor.execute('''insert into
-            search_terms(search_terms)
-            values('optimize')
+            search_terms(rowid, name, description, homepage)
+            select pkgnames.rowid, pkgnames.pkgname,
+                group_concat(distinct json_extract(data, '$.short_desc')),
+                group_concat(distinct json_extract(data, '$.homepage'))
+            from pkgnames
+            join (
+                select pkgname, repodata as data from packages
+                union all
+                select pkgname, templatedata as data from packages
+            ) using (pkgname)
+            group by pkgnames.rowid
             ''')
-        self._cursor.execute('''insert or replace into
+        self._stale.discard('search_terms')
+
+    def _fill_properties(self, pkgnames=None):
+        '''Fills properties of pkgnames, given as json list,
+        or of all packages.'''
+        if pkgnames is None:
+            self._cursor.execute('delete from package_properties')
+            condition = 'is not null'
+            arguments = []
+        else:
+            condition = 'in (select value from json_each(?))'
+            arguments = [pkgnames]
+            self._cursor.execute(f'''delete from package_properties
+                where package in (
+                    select rowid from packages where pkgname {condition}
+                )
+                ''', arguments)
+        self._cursor.execute('''insert into package_properties
+            (package, {})
+            select rowid, {}
+            from packages
+            where pkgname {}
+            '''.format(
+                ', '.join(_column(i) for i in PROPERTIES + LIST_PROPERTIES),
+                ', '.join([
+                    *(f'''json_extract({_property_source(i)}, '$."{i}"')'''
+                      for i in PROPERTIES),
+                    *(f'''case json_array_length(
+                        {_property_source(i)}, '$."{i}"'
+                    ) when 0 then '[]'
+                    else json_extract({_property_source(i)}, '$."{i}"') end'''
+                      for i in LIST_PROPERTIES),
+                ]),
+                condition
+            ), arguments)
+        if pkgnames is None:
+            self._stale.discard('properties')
+
+    def _fill_pkgnames(self):
+        '''Groups packages built from same template under name
+        of first of them, in single pass over packages.'''
+        self._cursor.execute('delete from pkgnames')
+        self._cursor.execute('''insert into
             pkgnames(pkgname, same_template)
-            select first.pkgname, min(second.pkgname)
-                from packages as first
-                join packages as second
-                on first.mainpkg = second.mainpkg
-                group by first.pkgname
-            ''')
-        self._cursor.execute('''create index if not exists pkgname_idx
-            on packages (
-            pkgname
-            )
-            ''')
-        self._cursor.execute('''create index if not exists pkgver_idx
-            on packages (
-            pkgver
-            )
-            ''')
-        self._cursor.execute('''create index if not exists builddate_idx
-            on packages (
-            builddate desc
-            )
-            ''')
-        self._cursor.execute('''create index if not exists popularity_idx
-            on packages (
-            popularity
+            select pkgname, min(same_template)
+            from (
+                select pkgname,
+                    min(pkgname) over (partition by mainpkg) as same_template
+                from packages
             )
+            group by pkgname
             ''')
-        self._cursor.execute('''create index if not exists daily_hash_idx
-            on daily_hash (
-            date
-            )
-            ''')
-        self._cursor.execute('''create index if not exists group_idx
-            on pkgnames (
-            same_template
+        self._stale.discard('pkgnames')
+
+    def finish_creating(self):
+        if 'pkgnames' in self._stale:
+            self._fill_pkgnames()
+            self._stale.add('search_terms')
+        if 'search_terms' in self._stale:
+            self._fill_search_terms()
+        if 'properties' in self._stale:
+            self._fill_properties()
+        if self._mode == 'delta':
+            time = datetime_to_string(sink.now().replace(microsecond=0))
+            self.set_auxiliary('update_time', time)
+        else:
+            self._cursor.execute('''insert into
+                search_terms(search_terms)
+                values('optimize')
+                ''')
+        for index in _OBSOLETE_INDEXES:
+            self._cursor.execute(f'drop index if exists {index}')
+        for index, definition in _INDEXES.items():
+            self._cursor.execute(
+                f'create index if not exists {index} on {definition}'
             )
-            ''')
-        self._cursor.execute('''analyze''')
+        if self._mode != 'delta':
+            self._cursor.execute('''analyze''')
+
+
+def _file_identity(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_dev, stat.st_ino)
+
+
+_readers = threading.local()
 
 
 def custom_factory(classname, *args, **kwargs):
@@ -598,13 +1270,49 @@ def datasource_arguments(temporary):
 
 
 def factory(temporary=False):
+    if not temporary:
+        return _reader()
     return custom_factory(
         config.DATASOURCE_CLASS,
         *datasource_arguments(temporary=temporary)
     )
 
 
-def update(func):
-    with factory(temporary=True) as source:
+def _reader():
+    '''Returns current datasource, opened once per thread
+    and reopened when database is replaced.'''
+    arguments = datasource_arguments(temporary=False)
+    source = getattr(_readers, 'source', None)
+    if (source is not None
+            and _readers.arguments == arguments
+            and not source.replaced()):
+        return source
+    if source is not None:
+        source.close()
+    _readers.source = custom_factory(config.DATASOURCE_CLASS, *arguments)
+    _readers.arguments = arguments
+    return _readers.source
+
+
+def existing():
+    '''Returns current datasource, or None if there is none yet.'''
+    if not os.path.exists(datasource_arguments(temporary=False)[0]):
+        return None
+    return factory()
+
+
+def delta(func):
+    '''Runs func on current datasource, changing it in place.'''
+    path = datasource_arguments(temporary=False)[0]
+    with custom_factory(config.DATASOURCE_CLASS, path, 'delta') as source:
         func(source)
         source.finish_creating()
+
+
+def update(func, stages=None):
+    if stages is None:
+        stages = sink.Stages('update')
+    with factory(temporary=True) as source:
+        func(source)
+        with stages.stage('finishing'):
+            source.finish_creating()
@@ -15,19 +15,38 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
+import argparse
 import os
 import subprocess
 import sys
-from collections import defaultdict
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import timedelta
 
 import datasource
-from sink import now
+from sink import Stages, now
+from srctemplate import (
+    NATIVE, XBPS_SRC, UnsupportedTemplate, parse_show, parse_template
+)
 
 
 DISTDIR = os.environ['XBPS_DISTDIR']
 
 
+PREVIOUS = 'previous database'
+
+
+_COMMIT_KEY = 'templates_commit'
+
+
+# Changes outside of srcpkgs that may change values of every template
+_GLOBAL_PATHS = {
+    'common',
+    'etc',
+    'xbps-src',
+}
+
+
 _XBPS_SRC_FIELDS = {
     'Upstream URL': 'homepage',
     'License(s)': 'license',
@@ -48,9 +67,7 @@ _SINGLE_VALUE_FIELDS = {
 }
 
 
-def templatedata(pkgname, arch):
-    del arch
-    result = defaultdict(list)
+def xbps_src_templatedata(pkgname):
     try:
         xbps_src = subprocess.run(
             [DISTDIR + '/xbps-src', 'show', '-p', 'restricted*', pkgname],
@@ -59,46 +76,161 @@ def templatedata(pkgname, arch):
             stderr=subprocess.DEVNULL
         )
     except subprocess.CalledProcessError:
-        return result
-    lines = xbps_src.stdout.decode('utf-8').split('\n')
-    for line in lines:
-        try:
-            field, value = line.split(':', 1)
-        except ValueError:
-            continue
-        result[field].append(value.strip())
-    return result
+        return defaultdict(list)
+    return parse_show(xbps_src.stdout.decode('utf-8'))
 
 
-def build_db(source, repos):
-    today = now().date()
-    tomorrow = today + timedelta(days=1)
+def native_templatedata(pkgname):
+    path = os.path.join(DISTDIR, 'srcpkgs', pkgname, 'template')
+    try:
+        with open(path, encoding='utf-8') as template:
+            return parse_template(template.read())
+    except (OSError, UnicodeDecodeError, UnsupportedTemplate):
+        return None
+
+
+def templatedata(pkgname, arch, native=True):
+    '''Returns values of template and way they were read,
+    NATIVE or XBPS_SRC.'''
+    del arch
+    if native:
+        result = native_templatedata(pkgname)
+        if result is not None:
+            return result, NATIVE
+    return xbps_src_templatedata(pkgname), XBPS_SRC
+
+
+def template_names():
+    '''Returns sorted names of templates in srcpkgs.'''
     srcpkgs = os.path.join(DISTDIR, 'srcpkgs')
+    names = []
     for pkgname in os.listdir(srcpkgs):
         entry = os.path.join(srcpkgs, pkgname)
         if os.path.islink(entry) or not os.path.isdir(entry):
             continue
-        raw_data = templatedata(pkgname, repos[0])
-        dictionary = {}
-        for k, v in raw_data.items():
-            k = _XBPS_SRC_FIELDS.get(k, k)
-            if k in _SINGLE_VALUE_FIELDS:
-                dictionary[k] = v[0]
-            else:
-                dictionary[k] = v
-        try:
-            pkgver = '{pkgname}-{version}_{revision}'.format(**dictionary)
-        except KeyError:
+        names.append(pkgname)
+    return sorted(names)
+
+
+def template_dictionary(pkgname, arch, native=True):
+    '''Returns dictionary of values of template, or None
+    if it is not possible to build package with it,
+    and way the template was read.'''
+    raw_data, way = templatedata(pkgname, arch, native)
+    dictionary = {}
+    for k, v in raw_data.items():
+        k = _XBPS_SRC_FIELDS.get(k, k)
+        if k in _SINGLE_VALUE_FIELDS:
+            dictionary[k] = v[0]
+        else:
+            dictionary[k] = v
+    try:
+        pkgver = '{pkgname}-{version}_{revision}'.format(**dictionary)
+    except KeyError:
+        return None, way
+    dictionary['pkgver'] = pkgver
+    dictionary['source-revisions'] = dictionary['pkgname']
+    return dictionary, way
+
+
+def read_templates(pkgnames, arch, jobs, native=True):
+    '''Yields tuples of pkgname, template_dictionary of it and way
+    it was read, in order of pkgnames, reading up to jobs at once.'''
+    with ThreadPoolExecutor(jobs) as executor:
+        results = executor.map(
+            template_dictionary,
+            pkgnames,
+            [arch] * len(pkgnames),
+            [native] * len(pkgnames)
+        )
+        for pkgname, (dictionary, way) in zip(pkgnames, results):
+            yield pkgname, dictionary, way
+
+
+def report_ways(templates, paths_file=None):
+    ways = Counter(way for _, _, way in templates)
+    print(
+        'dbfromrepo: templates read: {}'.format(', '.join(
+            f'{count} by {way}' for way, count in sorted(ways.items())
+        )),
+        file=sys.stderr
+    )
+    if paths_file:
+        with open(paths_file, 'w') as output:
+            for pkgname, _, way in templates:
+                print(pkgname, way, file=output)
+
+
+def _git(*args):
+    return subprocess.run(
+        ['git', '-C', DISTDIR, *args],
+        check=True,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL
+    ).stdout.decode('utf-8').strip()
+
+
+def current_commit():
+    try:
+        return _git('rev-parse', 'HEAD')
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def changed_templates(previous_commit):
+    '''Returns names of templates changed since previous_commit,
+    or None if every template may have changed.'''
+    if not previous_commit:
+        return None
+    try:
+        _git('merge-base', '--is-ancestor', previous_commit, 'HEAD')
+        paths = _git('diff', '--name-only', previous_commit, 'HEAD')
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    changed = set()
+    for path in paths.split('\n'):
+        parts = path.split('/')
+        if parts[0] == 'srcpkgs' and len(parts) > 1:
+            changed.add(parts[1])
+        elif parts[0] in _GLOBAL_PATHS:
+            return None
+    return changed
+
+
+def previous_templates(pkgnames):
+    '''Returns template_dictionary of templates of pkgnames not changed
+    since they were read into current database, by pkgname.'''
+    previous = datasource.existing()
+    if previous is None:
+        return {}
+    changed = changed_templates(next(previous.auxiliary(_COMMIT_KEY), None))
+    if changed is None:
+        return {}
+    result = {}
+    for pkgname in pkgnames:
+        if pkgname in changed:
             continue
-        dictionary['pkgver'] = pkgver
-        dictionary['source-revisions'] = dictionary['pkgname']
+        for row in previous.read(pkgname=pkgname):
+            dictionary = datasource.from_json(row.templatedata)
+            if dictionary:
+                result[pkgname] = dictionary
+                break
+    return result
+
+
+def save_templates(source, templates, dates):
+    created = []
+    for pkgname, dictionary, _ in templates:
+        if dictionary is None:
+            continue
+        pkgver = dictionary['pkgver']
         template_json = datasource.to_json(dictionary)
         restricted = dictionary.get('restricted', False)
         in_source = source.exists(pkgname=pkgname, pkgver=pkgver)
         if 'restricted' in dictionary or not in_source:
             if restricted == 'yes':
                 restricted = True
-            source.create(datasource.PackageRow(
+            created.append(datasource.PackageRow(
                 pkgname=pkgname,
                 pkgver=pkgver,
                 arch='unknown-unknown',
@@ -106,14 +238,92 @@ def build_db(source, repos):
                 templatedata=template_json,
                 mainpkg=pkgname,
                 repo=''
-            ), dates=[today, tomorrow])
+            ))
         else:
             source.update(
                 pkgname=pkgname,
                 pkgver=pkgver,
                 set_templatedata=template_json
             )
+    source.create_many(created, dates=dates)
+
+
+def build_db(
+        source, repos, jobs=1, stages=None, *,
+        native=True, paths_file=None, full=False
+):
+    # pylint: disable=too-many-arguments,too-many-locals
+    if stages is None:
+        stages = Stages('dbfromrepo')
+    today = now().date()
+    tomorrow = today + timedelta(days=1)
+    commit = current_commit()
+    with stages.stage('listing templates'):
+        pkgnames = template_names()
+        previous = {} if full or not commit else previous_templates(pkgnames)
+    with stages.stage('reading templates'):
+        unknown = [i for i in pkgnames if i not in previous]
+        read = {
+            pkgname: (dictionary, way)
+            for pkgname, dictionary, way
+            in read_templates(unknown, repos[0], jobs, native)
+        }
+    templates = [
+        (pkgname, previous[pkgname], PREVIOUS)
+        if pkgname in previous
+        else (pkgname, *read[pkgname])
+        for pkgname in pkgnames
+    ]
+    report_ways(templates, paths_file)
+    with stages.stage('saving templates'):
+        save_templates(source, templates, [today, tomorrow])
+        if commit:
+            source.add_auxiliary(_COMMIT_KEY, commit)
+
+
+def parse_args(args):
+    parser = argparse.ArgumentParser(
+        description='Loads data of templates into database.'
+    )
+    parser.add_argument(
+        '--jobs', '-j',
+        type=int,
+        default=1,
+        help='count of templates read in parallel'
+    )
+    parser.add_argument(
+        '--no-native',
+        dest='native',
+        action='store_false',
+        help='read all templates by xbps-src, without native parser'
+    )
+    parser.add_argument(
+        '--paths',
+        metavar='FILE',
+        help='file to write names of templates and ways they were read to'
+    )
+    parser.add_argument(
+        '--full',
+        action='store_true',
+        help='read all templates, even ones not changed since previous run'
+    )
+    parser.add_argument('repos', nargs='+')
+    return parser.parse_args(args)
+
+
+def main(*args):
+    arguments = parse_args(args)
+    stages = Stages('dbfromrepo')
+    datasource.update(
+        lambda x: build_db(
+            x, arguments.repos, arguments.jobs, stages,
+            native=arguments.native, paths_file=arguments.paths,
+            full=arguments.full
+        ),
+        stages
+    )
+    stages.report()
 
 
 if __name__ == '__main__':
-    datasource.update(lambda x: build_db(x, sys.argv[1:]))
+    main(*sys.argv[1:])
@@ -22,8 +22,15 @@ import datasource
 from repopaths import DATADIR
 
 
-def build_db(source):
-    data = json.load(open(os.path.join(DATADIR, 'popcorn.json')))
+def load(path=None):
+    if path is None:
+        path = os.path.join(DATADIR, 'popcorn.json')
+    with open(path) as popcorn:
+        return json.load(popcorn)
+
+
+def build_db(source, path=None):
+    data = load(path)
     reports = data.get('UniqueInstalls')
     if not reports:
         return
@@ -31,11 +38,11 @@ def build_db(source):
     source.update(
         set_popularity=0
     )
-    for pkgname, copies in data['Packages'].items():
-        source.update(
-            pkgname=pkgname,
-            set_popularity=copies
-        )
+    source.update_many(
+        ['pkgname'],
+        ['popularity'],
+        data['Packages'].items()
+    )
 
 
 if __name__ == '__main__':
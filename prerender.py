@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+
+# pkgs.void - web catalog of Void Linux packages.
+# Copyright (C) 2026 Piotr Wójcik <chocimier@tlen.pl>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from multiprocessing import get_context
+
+import datasource
+import voidhtml
+from settings import config
+
+
+# Links in GENERATED_FILES_PATH to directory of pages served,
+# and to directory of pages written, but not served yet
+PAGES = 'pages'
+STAGED = 'pages.new'
+MANIFEST = 'prerendered.json'
+CHUNK_SIZE = 100
+_LIST_PAGES = {
+    '/sets/': voidhtml.metapackages,
+    '/popular/': voidhtml.popular,
+    '/longest_names/': voidhtml.longest_names,
+}
+_RENDERER_FILES = ('custom_types.py', 'present.py', 'voidhtml.py')
+# Source and directory of pages of worker process
+_target = {}
+
+
+def page_path(url_path):
+    '''Returns path of file with page of url_path,
+    relative to directory of pages.'''
+    return url_path.strip('/') + '/index.html'
+
+
+def _package_url(pkgname):
+    return f'/package/{pkgname}/'
+
+
+def _link_path(name):
+    return os.path.join(config.GENERATED_FILES_PATH, name)
+
+
+def _linked_directory(name):
+    '''Returns path of directory name links to, or None.'''
+    try:
+        target = os.readlink(_link_path(name))
+    except FileNotFoundError:
+        return None
+    return os.path.join(config.GENERATED_FILES_PATH, target)
+
+
+def _write(directory, url_path, content):
+    filename = os.path.join(directory, page_path(url_path))
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    with open(filename, 'w', encoding='utf-8') as page_file:
+        page_file.write(content)
+
+
+def _set_target(source_arguments, directory):
+    _target['source'] = datasource.custom_factory(
+        config.DATASOURCE_CLASS,
+        *source_arguments
+    )
+    _target['directory'] = directory
+
+
+def _render_packages(pkgnames, source=None, directory=None):
+    source = source or _target['source']
+    directory = directory or _target['directory']
+    for pkgname in pkgnames:
+        _write(
+            directory,
+            _package_url(pkgname),
+            voidhtml.page_generator(pkgname, source=source)
+        )
+    return len(pkgnames)
+
+
+def _chunks(items, size):
+    iterator = iter(items)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def _renderer_digest(source):
+    '''Returns digest of everything shared by all package pages.'''
+    digest = hashlib.sha256()
+    templates = sorted(
+        os.path.join(directory, name)
+        for directory, _, names in os.walk('templates')
+        for name in names
+        if not name.endswith('.cache')
+    )
+    for filename in [*_RENDERER_FILES, *templates]:
+        with open(filename, 'rb') as code:
+            digest.update(code.read())
+    digest.update(repr((
+        config.ROOT_URL,
+        config.ASSETS_URL,
+        next(source.auxiliary('popularity_reports'), None),
+    )).encode())
+    return digest.hexdigest()
+
+
+def _load_manifest(directory):
+    if directory is None:
+        return {}
+    try:
+        with open(os.path.join(directory, MANIFEST)) as src:
+            return json.load(src)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def _save_manifest(directory, renderer, digests):
+    with open(os.path.join(directory, MANIFEST), 'w') as dst:
+        json.dump({'renderer': renderer, 'packages': digests}, dst)
+
+
+def _link_unchanged(previous_directory, directory, pkgnames):
+    '''Links pages of pkgnames from previous_directory into directory.
+    Returns pkgnames of pages missing there.'''
+    missing = []
+    for pkgname in pkgnames:
+        path = page_path(_package_url(pkgname))
+        os.makedirs(
+            os.path.dirname(os.path.join(directory, path)),
+            exist_ok=True
+        )
+        try:
+            os.link(
+                os.path.join(previous_directory, path),
+                os.path.join(directory, path)
+            )
+        except FileNotFoundError:
+            missing.append(pkgname)
+    return missing
+
+
+def _new_directory():
+    '''Returns path of new directory of pages, in place of one staged
+    by previous run, if any.'''
+    staged = _linked_directory(STAGED)
+    if staged is not None:
+        shutil.rmtree(staged, ignore_errors=True)
+        os.unlink(_link_path(STAGED))
+    os.makedirs(config.GENERATED_FILES_PATH, exist_ok=True)
+    directory = tempfile.mkdtemp(
+        dir=config.GENERATED_FILES_PATH,
+        prefix=PAGES + '.'
+    )
+    os.chmod(directory, 0o755)
+    return directory
+
+
+def _render_all(pkgnames, source_arguments, directory, jobs):
+    source = datasource.custom_factory(
+        config.DATASOURCE_CLASS,
+        *source_arguments
+    )
+    chunks = _chunks(pkgnames, CHUNK_SIZE)
+    if jobs <= 1:
+        for chunk in chunks:
+            _render_packages(chunk, source, directory)
+    else:
+        with ProcessPoolExecutor(
+            jobs,
+            mp_context=get_context('spawn'),
+            initializer=_set_target,
+            initargs=(source_arguments, directory)
+        ) as executor:
+            for _ in executor.map(_render_packages, chunks):
+                pass
+    for url_path, view in _LIST_PAGES.items():
+        _write(directory, url_path, view(source))
+    source.close()
+
+
+def prerender(jobs=1, temporary=False):
+    '''Writes pages of packages and list pages of current or temporary
+    database into new directory, to be served after publish. Pages
+    unchanged since previous run are linked instead of rendered.
+    Returns counts of rendered, removed and unchanged package pages.'''
+    source_arguments = [
+        datasource.datasource_arguments(temporary)[0],
+        'read',
+    ]
+    source = datasource.custom_factory(
+        config.DATASOURCE_CLASS,
+        *source_arguments
+    )
+    digests = source.page_digests()
+    renderer = _renderer_digest(source)
+    previous_directory = _linked_directory(PAGES)
+    manifest = _load_manifest(previous_directory)
+    previous = manifest.get('packages', {})
+    unchanged = [
+        pkgname for pkgname, digest in digests.items()
+        if previous.get(pkgname) == digest
+        and manifest.get('renderer') == renderer
+    ]
+    removed = [pkgname for pkgname in previous if pkgname not in digests]
+    directory = _new_directory()
+    linked = set(unchanged).difference(
+        _link_unchanged(previous_directory, directory, unchanged)
+    )
+    changed = [pkgname for pkgname in digests if pkgname not in linked]
+    source.close()
+    _render_all(changed, source_arguments, directory, jobs)
+    _save_manifest(directory, renderer, digests)
+    os.symlink(os.path.basename(directory), _link_path(STAGED))
+    return len(changed), len(removed), len(digests) - len(changed)
+
+
+def publish():
+    '''Serves pages written by last prerender instead of previous ones.'''
+    staged = _linked_directory(STAGED)
+    if staged is None:
+        return
+    previous_directory = _linked_directory(PAGES)
+    os.replace(_link_path(STAGED), _link_path(PAGES))
+    if previous_directory is not None:
+        shutil.rmtree(previous_directory, ignore_errors=True)
+
+
+def parse_args(args):
+    parser = argparse.ArgumentParser(
+        description='Writes pages of packages to generated files.'
+    )
+    parser.add_argument(
+        '--jobs', '-j',
+        type=int,
+        default=1,
+        help='count of processes rendering pages in parallel'
+    )
+    parser.add_argument(
+        '--temporary',
+        action='store_true',
+        help='render pages of database being built, not of current one'
+    )
+    parser.add_argument(
+        '--publish',
+        action='store_true',
+        help='serve pages rendered before instead of rendering'
+    )
+    return parser.parse_args(args)
+
+
+def main(*args):
+    arguments = parse_args(args)
+    if arguments.publish:
+        publish()
+        return
+    rendered, removed, unchanged = prerender(
+        arguments.jobs,
+        arguments.temporary
+    )
+    print(
+        f'prerender: {rendered} rendered, {removed} removed, '
+        f'{unchanged} unchanged package pages',
+        file=sys.stderr
+    )
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
@@ -13,7 +13,12 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
+import hashlib
+import importlib.util
+import os
+import re
 from collections import Counter, namedtuple
+from functools import lru_cache
 from urllib.parse import quote as urlquote
 
 # pylint can't import modules from create_module, so import-error
@@ -21,7 +26,7 @@ from urllib.parse import quote as urlquote
 # above makes lines too long, so noqa
 import tenjin.helpers  # pylint: disable=import-error
 from humanize import naturalsize
-from tenjin import MemoryCacheStorage, SafeEngine, SafePreprocessor
+from tenjin import MarshalCacheStorage, SafeEngine, SafePreprocessor
 from tenjin.escaped import as_escaped, to_escaped  # noqa, pylint: disable=import-error
 from tenjin.helpers import echo, to_str  # noqa, pylint: disable=unused-import,import-error
 
@@ -30,6 +35,8 @@ from settings import config
 
 
 Area = namedtuple('Area', ('value', 'coords'))
+TEMPLATES_PATH = 'templates'
+_FORMATTED_PACKAGES = 65536
 
 
 class CustomPreprocessor(SafePreprocessor):
@@ -43,17 +50,40 @@ class CustomPreprocessor(SafePreprocessor):
         )
 
 
+class CompiledTemplateStorage(MarshalCacheStorage):
+    '''Compiled templates in files next to their sources, shared by
+    processes. Files which can't be written are kept in memory only.'''
+    def _store(self, cachepath, dct):
+        try:
+            super()._store(cachepath, dct)
+        except OSError:
+            pass
+
+
+class CustomEngine(SafeEngine):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.version = _compiled_version()
+
+    def cachename(self, filepath):
+        '''
+        Templates are preprocessed with web parameters and compiled
+        to bytecode of running Python, so both are part of file name
+        '''
+        return f'{filepath}.{self.version}.cache'
+
+
 class LoaderCache:
     def __init__(self):
         self.engine = None
 
     def loader(self):
         if config.DEVEL_MODE or self.engine is None:
-            self.engine = SafeEngine(
-                path=['templates'],
+            self.engine = CustomEngine(
+                path=[TEMPLATES_PATH],
                 preprocess=True,
                 preprocessorclass=CustomPreprocessor,
-                cache=MemoryCacheStorage()
+                cache=CompiledTemplateStorage()
             )
         return self.engine
 
@@ -72,6 +102,44 @@ def web_parameters():
     }
 
 
+def _compiled_version():
+    parameters = {
+        key: value for key, value in web_parameters().items()
+        if isinstance(value, str)
+    }
+    key = repr((importlib.util.MAGIC_NUMBER, sorted(parameters.items())))
+    return hashlib.sha256(key.encode()).hexdigest()[:16]
+
+
+def _template_names():
+    for directory, _, names in os.walk(TEMPLATES_PATH):
+        for name in names:
+            if not name.endswith('.cache'):
+                yield os.path.relpath(os.path.join(directory, name),
+                                      TEMPLATES_PATH)
+
+
+def precompile():
+    '''Writes compiled templates, to be loaded without compiling them
+    on first use in each process. Removes ones compiled before with other
+    parameters. Returns count of templates.'''
+    engine = _loader()
+    names = sorted(_template_names())
+    for name in names:
+        engine.get_template(name, _context={
+            'masks_presenter': _masks_presenter,
+            **web_parameters(),
+        })
+    current = {engine.cachename(os.path.abspath(
+        os.path.join(TEMPLATES_PATH, name))) for name in names}
+    for directory, _, files in os.walk(TEMPLATES_PATH):
+        for name in files:
+            filename = os.path.abspath(os.path.join(directory, name))
+            if name.endswith('.cache') and filename not in current:
+                os.unlink(filename)
+    return len(names)
+
+
 def parse_contact(value):
     return value.split('<')[0].strip()
 
@@ -118,6 +186,24 @@ def as_new_version(versions):
     )
 
 
+# Part of version up to revision, and revision
+_VERSION_PART = re.compile(r'(.[^_]*)(_[0-9]*)?', re.DOTALL)
+
+
+def _format_version(pkgver):
+    '''Returns version constraint with revisions as subscripts.'''
+    if '_' not in pkgver:
+        return to_escaped(pkgver)
+    return ''.join(
+        to_escaped(version)
+        + (f'<sub>{to_escaped(revision)}</sub>' if revision else '')
+        for version, revision in _VERSION_PART.findall(pkgver)
+    )
+
+
+# Formatted dependencies of package pages, depending only on value,
+# repeat in many pages and many times in big ones
+@lru_cache(maxsize=_FORMATTED_PACKAGES)
 def as_package(value):
     pkgname = value
     pkgver = ''
@@ -130,32 +216,9 @@ def as_package(value):
     if pkgver == '>=0':
         pkgver = ''
     href = config.ROOT_URL + '/package/' + urlquote(pkgname)
-    if '_' in pkgver:
-        pairs = []
-        version = ''
-        revision = ''
-        while pkgver:
-            if revision:
-                if pkgver[0].isdigit():
-                    revision += pkgver[0]
-                else:
-                    pairs.append((version, revision))
-                    version = pkgver[0]
-                    revision = ''
-            else:
-                if pkgver[0] == '_':
-                    revision = pkgver[0]
-                else:
-                    version += pkgver[0]
-            pkgver = pkgver[1:]
-        if version:
-            pairs.append((version, revision))
-        pkgver = render_template('small/as_package.html', SNIPPET, pairs=pairs)
-    else:
-        pkgver = to_escaped(pkgver)
     return as_escaped(
         render_link(href, pkgname)
-        + as_escaped(pkgver.rstrip('\n'))
+        + as_escaped(_format_version(pkgver).rstrip('\n'))
     )
 
 
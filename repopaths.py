@@ -64,6 +64,19 @@ def load_repo(path):
         return None
 
 
+def _stream_repo(xml_file, types):
+    with xml_file:
+        yield from plistop.iterparse(xml_file, types)
+
+
+def stream_repo(path, types=None):
+    try:
+        xml_file = open(path, 'rb')
+    except FileNotFoundError:
+        return None
+    return _stream_repo(xml_file, types)
+
+
 _COMMANDS = {
     'directory_name': directory_name,
     'rsync_path': rsync_path,
@@ -0,0 +1,249 @@
+# pkgs.void - web catalog of Void Linux packages.
+# Copyright (C) 2026 Piotr Wójcik <chocimier@tlen.pl>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import hashlib
+import os
+import shutil
+import sys
+import tempfile
+import threading
+from collections import Counter, OrderedDict
+from contextlib import suppress
+from functools import wraps
+
+from flask import request
+
+import datasource
+from settings import config
+
+
+class ResponseCache:
+    '''Least recently used pages of single database generation,
+    limited by memory they take.'''
+    def __init__(self, budget):
+        self.budget = budget
+        self.size = 0
+        self.counts = Counter(hits=0, misses=0, evictions=0)
+        self._generation = None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _sizeof(key, value):
+        return sys.getsizeof(key) + sys.getsizeof(value)
+
+    def _drop(self):
+        key, value = self._entries.popitem(last=False)
+        self.size -= self._sizeof(key, value)
+
+    def get(self, generation, key):
+        '''Returns page stored for key, or None. Pages of other
+        generation are forgotten.'''
+        with self._lock:
+            if generation != self._generation:
+                self._entries.clear()
+                self.size = 0
+                self._generation = generation
+            value = self._entries.get(key)
+            if value is None:
+                self.counts['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.counts['hits'] += 1
+            return value
+
+    def put(self, generation, key, value):
+        size = self._sizeof(key, value)
+        with self._lock:
+            if generation != self._generation or size > self.budget:
+                return
+            if key in self._entries:
+                self.size -= self._sizeof(key, self._entries.pop(key))
+            while self._entries and self.size + size > self.budget:
+                self._drop()
+                self.counts['evictions'] += 1
+            self._entries[key] = value
+            self.size += size
+
+    def stats(self):
+        with self._lock:
+            return {
+                **self.counts,
+                'entries': len(self._entries),
+                'size': self.size,
+                'budget': self.budget,
+            }
+
+
+class DiskCache:
+    '''Pages in files of directory shared by processes, removed least
+    recently used first when they take more than budget.'''
+    def __init__(self, path, budget):
+        self.path = path
+        self.budget = budget
+        self.size = 0
+        self.counts = Counter(hits=0, misses=0, evictions=0)
+        self._written = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _digest(value):
+        return hashlib.sha256(repr(value).encode()).hexdigest()
+
+    def _directory(self, generation):
+        return os.path.join(self.path, self._digest(generation)[:16])
+
+    def _filename(self, generation, key):
+        return os.path.join(self._directory(generation), self._digest(key))
+
+    def _drop_other_generations(self, generation):
+        current = os.path.basename(self._directory(generation))
+        try:
+            entries = list(os.scandir(self.path))
+        except OSError:
+            return
+        for entry in entries:
+            if entry.name != current and entry.is_dir():
+                shutil.rmtree(entry.path, ignore_errors=True)
+
+    def get(self, generation, key):
+        '''Returns page stored for key, or None. Pages of other
+        generation are removed. Files changed by other processes
+        meanwhile count as missing.'''
+        filename = self._filename(generation, key)
+        if not os.path.isdir(os.path.dirname(filename)):
+            self._drop_other_generations(generation)
+        try:
+            with open(filename, encoding='utf-8') as page_file:
+                value = page_file.read()
+            os.utime(filename)
+        except OSError:
+            with self._lock:
+                self.counts['misses'] += 1
+            return None
+        with self._lock:
+            self.counts['hits'] += 1
+        return value
+
+    @staticmethod
+    def _write(filename, data):
+        directory = os.path.dirname(filename)
+        os.makedirs(directory, exist_ok=True)
+        descriptor, temporary = tempfile.mkstemp(dir=directory, prefix='.')
+        try:
+            with os.fdopen(descriptor, 'wb') as page_file:
+                page_file.write(data)
+            os.replace(temporary, filename)
+        except OSError:
+            with suppress(OSError):
+                os.unlink(temporary)
+            raise
+
+    def put(self, generation, key, value):
+        '''Stores page, unless directory is removed by other process
+        meanwhile.'''
+        data = value.encode('utf-8')
+        if len(data) > self.budget:
+            return
+        try:
+            self._write(self._filename(generation, key), data)
+        except OSError:
+            return
+        with self._lock:
+            self._written += len(data)
+            if self._written * 10 < self.budget:
+                return
+            self._written = 0
+        self._evict()
+
+    def _evict(self):
+        '''Removes oldest used pages until they fit in budget.'''
+        files = []
+        try:
+            directories = list(os.scandir(self.path))
+        except OSError:
+            return
+        for directory in directories:
+            try:
+                entries = list(os.scandir(directory.path))
+            except OSError:
+                continue
+            for entry in entries:
+                if entry.name.startswith('.'):
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+        files.sort()
+        size = sum(i[1] for i in files)
+        evicted = 0
+        for _, file_size, filename in files:
+            if size <= self.budget:
+                break
+            try:
+                os.unlink(filename)
+                evicted += 1
+            except OSError:
+                pass
+            size -= file_size
+        with self._lock:
+            self.size = size
+            self.counts['evictions'] += evicted
+
+    def stats(self):
+        with self._lock:
+            return {
+                **self.counts,
+                'size': self.size,
+                'budget': self.budget,
+            }
+
+
+def _make_cache():
+    if config.RESPONSE_CACHE == 'disk':
+        return DiskCache(
+            config.RESPONSE_CACHE_PATH,
+            config.RESPONSE_CACHE_BYTES
+        )
+    return ResponseCache(config.RESPONSE_CACHE_BYTES)
+
+
+cache = _make_cache()
+
+
+def database_generation():
+    '''Identifies contents of current database.'''
+    source = datasource.factory()
+    return next(source.auxiliary('update_time'), None)
+
+
+def cached(view, variant=None):
+    '''Wraps view to serve pages from cache, keyed by url and, if given,
+    result of variant, for pages depending on more than database.'''
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not cache.budget:
+            return view(*args, **kwargs)
+        current = database_generation()
+        key = (request.path, variant() if variant else None)
+        page = cache.get(current, key)
+        if page is None:
+            page = view(*args, **kwargs)
+            if isinstance(page, str):
+                cache.put(current, key, page)
+        return page
+    return wrapper
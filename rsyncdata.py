@@ -17,15 +17,11 @@
 
 import sys
 from collections import namedtuple
-from datetime import datetime
 
 import datasource
 from repopaths import rsync_load
 
 
-_DATE_FORMAT = "%Y/%m/%d %H:%M:%S"
-
-
 Stats = namedtuple('Stats', ('perms', 'size', 'date', 'time', 'name'))
 
 
@@ -50,22 +46,28 @@ def _is_of_arch(binpkg, repo):
     return binpkg_arch in (arch, 'noarch')
 
 
-def _process_repo(source, repo, rsync_listing):
-    """Sets build date for packages not defining it in index."""
+def _builddate(record):
+    """Converts date and time listed as 2020/01/31 12:34:56
+    to 2020-01-31 12:34."""
+    return record.date.replace('/', '-') + ' ' + record.time[:5]
+
+
+def _builddates(repo, rsync_listing):
     for line in rsync_listing:
-        line = line.strip()
         record = _stats(line)
         if record and _is_of_arch(record.name, repo):
-            date = datetime.strptime(
-                record.date + ' ' + record.time,
-                _DATE_FORMAT
-            )
-            source.update(
-                pkgver=_pkgver_from_filename(record.name),
-                repo=repo,
-                builddate='',
-                set_builddate=date.strftime('%Y-%m-%d %H:%M')
-            )
+            yield _pkgver_from_filename(record.name), _builddate(record)
+
+
+def _process_repo(source, repo, rsync_listing):
+    """Sets build date for packages not defining it in index."""
+    source.update_many(
+        ['pkgver'],
+        ['builddate'],
+        _builddates(repo, rsync_listing),
+        repo=repo,
+        builddate=''
+    )
 
 
 def build_db(source, repos):
@@ -46,6 +46,8 @@ def convert_types(values, section):
         # pylint: disable=superfluous-parens
         values.DEVEL_MODE = (values.DEVEL_MODE == 'yes')
         values.DAILY_HASH_BITS = int(values.DAILY_HASH_BITS)
+        values.INSERT_CHUNK_SIZE = int(values.INSERT_CHUNK_SIZE)
+        values.RESPONSE_CACHE_BYTES = int(values.RESPONSE_CACHE_BYTES)
     if section == 'buildlog':
         values.PERIODIC_SCRAP_PERIOD = int(values.PERIODIC_SCRAP_PERIOD)
         values.PERIODIC_SCRAP_COUNT = int(values.PERIODIC_SCRAP_COUNT)
@@ -15,6 +15,9 @@
 
 
 import datetime
+import sys
+import time
+from contextlib import contextmanager
 
 
 def removeprefix(string, prefix):
@@ -37,3 +40,25 @@ def same(arg):
 
 def now():
     return datetime.datetime.now(datetime.timezone.utc)
+
+
+class Stages:
+    '''Measures wall time of named stages of a program.'''
+    def __init__(self, program):
+        self.program = program
+        self.times = []
+
+    @contextmanager
+    def stage(self, name):
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.times.append((name, time.monotonic() - start))
+
+    def report(self, file=None):
+        for name, seconds in self.times:
+            print(
+                f'{self.program}: {name}: {seconds:.2f}s',
+                file=file or sys.stderr
+            )
@@ -0,0 +1,227 @@
+# pkgs.void - web catalog of Void Linux packages.
+# Copyright (C) 2026 Piotr Wójcik <chocimier@tlen.pl>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+'''Reading values of void-packages templates without running xbps-src.
+
+Only templates consisting of assignments of literal values, optionally
+referring to variables assigned earlier, and of function definitions
+are understood. Anything else raises UnsupportedTemplate, and such
+template should be evaluated by xbps-src show.
+'''
+
+import re
+from collections import defaultdict
+
+
+NATIVE = 'native'
+XBPS_SRC = 'xbps-src'
+
+
+class UnsupportedTemplate(Exception):
+    '''Template needs shell to be evaluated.'''
+
+
+_NAME = r'[A-Za-z_][A-Za-z0-9_]*'
+_ASSIGNMENT = re.compile(rf'({_NAME})=')
+_FUNCTION = re.compile(rf'{_NAME}\s*\(\)\s*\{{')
+_REFERENCE = re.compile(rf'\$(?:({_NAME})|\{{({_NAME})\}})')
+_UNQUOTED_SPECIAL = set('\\`()<>|&;~')
+_DOUBLE_QUOTED_ESCAPABLE = set('"\\$`')
+
+
+# Variables shown by xbps-src, but not read here. The catalog displays
+# them, so they must come from xbps-src to look the same.
+_SHOWN_ELSEWHERE = {
+    'build_options',
+    'changelog',
+}
+
+
+# Variables holding lists, shown by xbps-src one word per line
+_LIST_VARIABLES = (
+    'distfiles',
+    'conflicts',
+    'provides',
+    'reverts',
+)
+
+
+_SINGLE_VALUE_VARIABLES = (
+    'pkgname',
+    'version',
+    'revision',
+    'maintainer',
+    'homepage',
+    'license',
+    'short_desc',
+    'restricted',
+)
+
+
+class _Parser:
+    def __init__(self, text):
+        self.text = text
+        self.pos = 0
+        self.variables = {}
+
+    def parse(self):
+        while self.pos < len(self.text):
+            line = self._line()
+            stripped = line.strip()
+            if not stripped or stripped.startswith('#'):
+                self._next_line()
+            elif _FUNCTION.match(line):
+                self._skip_function(line)
+            else:
+                match = _ASSIGNMENT.match(line)
+                if not match:
+                    raise UnsupportedTemplate(f'statement: {stripped}')
+                self.pos += match.end()
+                self.variables[match.group(1)] = self._word()
+                self._line_end()
+        return self.variables
+
+    def _line(self):
+        end = self.text.find('\n', self.pos)
+        if end < 0:
+            end = len(self.text)
+        return self.text[self.pos:end]
+
+    def _next_line(self):
+        self.pos += len(self._line()) + 1
+
+    def _skip_function(self, line):
+        if line.rstrip().endswith('}'):
+            self._next_line()
+            return
+        while self.pos < len(self.text):
+            line = self._line()
+            self._next_line()
+            if line.rstrip() == '}':
+                return
+        raise UnsupportedTemplate('unterminated function')
+
+    def _line_end(self):
+        rest = self._line()
+        stripped = rest.strip()
+        if stripped and not (rest[0].isspace() and stripped[0] == '#'):
+            raise UnsupportedTemplate(f'after assignment: {stripped}')
+        self._next_line()
+
+    def _reference(self):
+        match = _REFERENCE.match(self.text, self.pos)
+        if not match:
+            raise UnsupportedTemplate('expansion')
+        name = match.group(1) or match.group(2)
+        if name not in self.variables:
+            raise UnsupportedTemplate(f'unknown variable: {name}')
+        self.pos = match.end()
+        return self.variables[name]
+
+    def _single_quoted(self):
+        end = self.text.find("'", self.pos + 1)
+        if end < 0:
+            raise UnsupportedTemplate('unterminated quote')
+        value = self.text[self.pos + 1:end]
+        self.pos = end + 1
+        return value
+
+    def _double_quoted(self):
+        self.pos += 1
+        parts = []
+        while self.pos < len(self.text):
+            char = self.text[self.pos]
+            if char == '"':
+                self.pos += 1
+                return ''.join(parts)
+            if char == '$':
+                parts.append(self._reference())
+                continue
+            if char == '`':
+                raise UnsupportedTemplate('command substitution')
+            if char == '\\':
+                following = self.text[self.pos + 1:self.pos + 2]
+                if following == '\n':
+                    self.pos += 2
+                    continue
+                if following in _DOUBLE_QUOTED_ESCAPABLE:
+                    parts.append(following)
+                    self.pos += 2
+                    continue
+            parts.append(char)
+            self.pos += 1
+        raise UnsupportedTemplate('unterminated quote')
+
+    def _word(self):
+        parts = []
+        while self.pos < len(self.text):
+            char = self.text[self.pos]
+            if char.isspace():
+                break
+            if char == "'":
+                parts.append(self._single_quoted())
+            elif char == '"':
+                parts.append(self._double_quoted())
+            elif char == '$':
+                parts.append(self._reference())
+            elif char in _UNQUOTED_SPECIAL:
+                raise UnsupportedTemplate(f'unquoted {char}')
+            else:
+                parts.append(char)
+                self.pos += 1
+        return ''.join(parts)
+
+
+def parse_template(text):
+    '''Returns values of template like parse_show does for output
+    of xbps-src show, limited to fields used by catalog.
+    Raises UnsupportedTemplate if template is not simple enough.'''
+    variables = _Parser(text).parse()
+    used_elsewhere = _SHOWN_ELSEWHERE.intersection(variables)
+    if used_elsewhere:
+        raise UnsupportedTemplate(f'sets {", ".join(used_elsewhere)}')
+    for name in _SINGLE_VALUE_VARIABLES:
+        if '\n' in variables.get(name, ''):
+            raise UnsupportedTemplate(f'multiline {name}')
+    result = defaultdict(list)
+    for name in ('pkgname', 'version', 'revision'):
+        if name in variables:
+            result[name].append(variables[name].strip())
+    for name in _LIST_VARIABLES:
+        words = variables.get(name, '').split()
+        if words:
+            result[name].extend(words)
+    result['maintainer'].append(variables.get('maintainer', '').strip())
+    if variables.get('homepage'):
+        result['Upstream URL'].append(variables['homepage'].strip())
+    if variables.get('license'):
+        result['License(s)'].append(variables['license'].strip())
+    result['short_desc'].append(variables.get('short_desc', '').strip())
+    if variables.get('restricted'):
+        result['restricted'].append(variables['restricted'].strip())
+    return result
+
+
+def parse_show(text):
+    '''Returns values printed by xbps-src show
+    as dictionary of lists of values.'''
+    result = defaultdict(list)
+    for line in text.split('\n'):
+        try:
+            field, value = line.split(':', 1)
+        except ValueError:
+            continue
+        result[field].append(value.strip())
+    return result
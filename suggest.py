@@ -0,0 +1,122 @@
+# pkgs.void - web catalog of Void Linux packages.
+# Copyright (C) 2026 Piotr Wójcik <chocimier@tlen.pl>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import heapq
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+
+import datasource
+from responsecache import database_generation
+
+
+# Count of suggestions returned by default, and at most
+SUGGESTIONS = 10
+MAX_SUGGESTIONS = 50
+# Suggestions for prefixes of names up to this length, matching many
+# names, are remembered
+_REMEMBERED_LENGTH = 2
+
+
+def _deletions(word):
+    return {word[:i] + word[i + 1:] for i in range(len(word))}
+
+
+def _within_one_edit(first, second):
+    '''Returns whether words differ by at most one insertion, deletion,
+    substitution or transposition of adjacent characters.'''
+    if abs(len(first) - len(second)) > 1:
+        return False
+    start = 0
+    while start < min(len(first), len(second)) and (
+            first[start] == second[start]):
+        start += 1
+    first, second = first[start:], second[start:]
+    if first[1:] == second[1:] or first[1:] == second or first == second[1:]:
+        return True
+    return first[:2] == second[1::-1] and first[2:] == second[2:]
+
+
+class SuggestionIndex:
+    '''Names of packages, found by prefix or with a typo,
+    most popular first.'''
+    def __init__(self, entries):
+        self._keys = []
+        self._entries = []
+        self._deleted = defaultdict(list)
+        self._remembered = {}
+        for pkgname, description, popularity in sorted(entries):
+            number = len(self._entries)
+            key = pkgname.lower()
+            self._keys.append(key)
+            self._entries.append((pkgname, description, popularity or 0))
+            for deleted in _deletions(key):
+                self._deleted[deleted].append(number)
+
+    def _rank(self, number):
+        pkgname, _, popularity = self._entries[number]
+        return (-popularity, len(pkgname), pkgname)
+
+    def _prefixed(self, key):
+        start = bisect_left(self._keys, key)
+        end = bisect_left(self._keys, key + '\U0010ffff', start)
+        return range(start, end)
+
+    def _similar(self, key):
+        '''Returns numbers of names within one edit of key.'''
+        candidates = set(self._deleted.get(key, ()))
+        for deleted in _deletions(key) | {key}:
+            number = bisect_left(self._keys, deleted)
+            if number < len(self._keys) and self._keys[number] == deleted:
+                candidates.add(number)
+            candidates.update(self._deleted.get(deleted, ()))
+        return {i for i in candidates if _within_one_edit(key, self._keys[i])}
+
+    def suggest(self, query, limit):
+        '''Returns up to limit pairs of pkgname and description,
+        names starting with query first, then names with a typo.'''
+        key = query.strip().lower()
+        if not key:
+            return []
+        if len(key) > _REMEMBERED_LENGTH or not self._prefixed(key):
+            return self._suggest(key, limit)
+        if (key, limit) not in self._remembered:
+            self._remembered[(key, limit)] = self._suggest(key, limit)
+        return self._remembered[(key, limit)]
+
+    def _suggest(self, key, limit):
+        found = heapq.nsmallest(limit, self._prefixed(key), key=self._rank)
+        if len(found) < limit:
+            found += heapq.nsmallest(
+                limit - len(found),
+                self._similar(key).difference(found),
+                key=self._rank
+            )
+        return [self._entries[i][:2] for i in found]
+
+
+_lock = threading.Lock()
+_current = {}
+
+
+def suggestion_index():
+    '''Returns index of current database, built once for its generation.'''
+    generation = database_generation()
+    with _lock:
+        if _current.get('generation') != generation:
+            source = datasource.factory()
+            _current['index'] = SuggestionIndex(source.suggestions())
+            _current['generation'] = generation
+        return _current['index']
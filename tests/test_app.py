@@ -0,0 +1,106 @@
+# pkgs.void - web catalog of Void Linux packages.
+# Copyright (C) 2026 Piotr Wójcik <chocimier@tlen.pl>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import datetime
+
+import pytest
+
+import app
+import datasource
+import prerender
+import responsecache
+import voidhtml
+from datasource import PackageRow, SqliteDataSource
+from settings import config
+
+
+_UPDATED = datetime.datetime(2026, 1, 28, 12, 0, 0)
+
+
+@pytest.fixture(name='client')
+def client_fixture(tmp_path, monkeypatch):
+    path = str(tmp_path / 'index.sqlite3')
+    with SqliteDataSource(path, 'write') as written:
+        _fill(written)
+    source = SqliteDataSource(path, 'read')
+    monkeypatch.setattr(datasource, 'factory', lambda: source)
+    monkeypatch.setattr(config, 'DATASOURCE_ARGUMENTS', f'{path},read')
+    monkeypatch.setattr(config, 'GENERATED_FILES_PATH', str(tmp_path))
+    monkeypatch.setattr(responsecache, 'cache', responsecache.ResponseCache(
+        1 << 20
+    ))
+    yield app.app.test_client()
+    source.close()
+
+
+def _fill(source):
+    source.create_many([
+        PackageRow(
+            pkgver='gcc-12.2.0_2',
+            arch='x86_64',
+            repo='x86_64',
+            repodata={
+                'pkgver': 'gcc-12.2.0_2',
+                'build-date': '2026-01-27',
+                'short_desc': 'GNU Compiler Collection',
+            },
+            mainpkg='gcc',
+        ),
+    ], [_UPDATED.date()])
+    source.set_auxiliary(
+        'update_time',
+        datasource.datetime_to_string(_UPDATED)
+    )
+    source.finish_creating()
+
+
+@pytest.mark.parametrize('url', ['/', '/newest/'])
+def test_cached_pages_show_current_time_since_update(client, monkeypatch, url):
+    for minutes, ago in ((1, 'a minute ago'), (5, '5 minutes ago')):
+        monkeypatch.setattr(
+            voidhtml,
+            'now',
+            lambda minutes=minutes: _UPDATED + datetime.timedelta(
+                minutes=minutes
+            )
+        )
+        page = client.get(url).get_data(as_text=True)
+        assert f'2026-01-28 12:00:00 UTC ({ago})' in page
+        assert voidhtml.AGO_PLACEHOLDER not in page
+    assert responsecache.cache.stats()['hits'] == 1
+
+
+def test_prerendered_pages_served_once_published(client, tmp_path):
+    def served():
+        return client.get('/package/gcc/').get_data(as_text=True)
+
+    live = served()
+    assert 'GNU Compiler Collection' in live
+    assert prerender.prerender() == (1, 0, 0)
+    assert not (tmp_path / prerender.PAGES).exists()
+    prerender.publish()
+    page = tmp_path / prerender.PAGES / 'package' / 'gcc' / 'index.html'
+    assert page.read_text() == live
+    page.write_text('prerendered')
+    assert served() == 'prerendered'
+    assert prerender.prerender() == (0, 0, 1)
+    prerender.publish()
+    assert served() == 'prerendered'
+    assert len(list(tmp_path.glob(prerender.PAGES + '.*'))) == 1
+    page.unlink()
+    assert served() == live
+    assert prerender.prerender() == (1, 0, 0)
+    prerender.publish()
+    assert page.read_text() == live
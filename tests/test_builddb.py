@@ -0,0 +1,183 @@
+# pkgs.void - web catalog of Void Linux packages.
+# Copyright (C) 2026 Piotr Wójcik <chocimier@tlen.pl>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import sqlite3
+from contextlib import closing
+
+import pytest
+
+import builddb
+import datasource
+
+
+_INDEX = '''<?xml version="1.0" encoding="UTF-8"?>
+<!DOCTYPE plist PUBLIC "-//Apple//DTD PLIST 1.0//EN" "http://www.apple.com/DTDs/PropertyList-1.0.dtd">
+<plist version="1.0">
+<dict>
+	<key>gcc</key>
+	<dict>
+		<key>architecture</key>
+		<string>x86_64</string>
+		<key>build-date</key>
+		<string>2023-01-28 10:12 CET</string>
+		<key>installed_size</key>
+		<integer>105438208</integer>
+		<key>pkgver</key>
+		<string>gcc-12.2.0_2</string>
+		<key>preserve</key>
+		<true/>
+		<key>run_depends</key>
+		<array>
+			<string>binutils&gt;=0</string>
+			<string>libgcc-devel&gt;=12.2.0_2</string>
+		</array>
+		<key>short_desc</key>
+		<string>GNU Compiler Collection</string>
+		<key>source-revisions</key>
+		<string>gcc:4f3a2b1c</string>
+		<key>alternatives</key>
+		<dict>
+			<key>cc</key>
+			<array>
+				<string>cc:gcc</string>
+			</array>
+		</dict>
+	</dict>
+	<key>void-docs</key>
+	<dict>
+		<key>changelog</key>
+		<string></string>
+		<key>pkgver</key>
+		<string>void-docs-2023.01.28_1</string>
+		<key>signature</key>
+		<data>c2lnbmF0dXJl</data>
+	</dict>
+</dict>
+</plist>
+'''
+
+
+def test_package_rows_stream_equals_tree(tmp_path, monkeypatch):
+    path = tmp_path / 'index.plist'
+    path.write_text(_INDEX)
+    monkeypatch.setattr(builddb, 'index_path', lambda repo: str(path))
+    tree = list(builddb.package_rows('x86_64', 'tree'))
+    stream = list(builddb.package_rows('x86_64', 'stream'))
+    assert len(tree) == 2
+    assert stream == tree
+
+
+def test_package_rows_missing_index(tmp_path, monkeypatch):
+    path = tmp_path / 'index.plist'
+    monkeypatch.setattr(builddb, 'index_path', lambda repo: str(path))
+    assert not list(builddb.package_rows('x86_64', 'stream'))
+
+
+def test_repos_rows_parallel_keeps_order(tmp_path, monkeypatch):
+    path = tmp_path / 'index.plist'
+    path.write_text(_INDEX)
+    monkeypatch.setattr(builddb, 'index_path', lambda repo: str(path))
+    repos = ['x86_64', 'musl/x86_64-musl', 'aarch64/aarch64']
+    sequential = [
+        (repo, list(rows))
+        for repo, rows in builddb._repos_rows(repos, 'stream', 1)
+    ]
+    parallel = [
+        (repo, list(rows))
+        for repo, rows in builddb._repos_rows(repos, 'stream', 3)
+    ]
+    assert [repo for repo, _ in parallel] == repos
+    assert [row.repo for _, rows in parallel for row in rows] == [
+        repo for repo in repos for _ in range(2)
+    ]
+    assert parallel == sequential
+
+
+def test_repos_rows_parallel_streams_chunks(tmp_path, monkeypatch):
+    path = tmp_path / 'index.plist'
+    path.write_text(_INDEX)
+    monkeypatch.setattr(builddb, 'index_path', lambda repo: str(path))
+    monkeypatch.setattr(builddb.config, 'INSERT_CHUNK_SIZE', 1)
+    repos = ['x86_64', 'musl/x86_64-musl', 'aarch64/aarch64']
+    parallel = builddb._repos_rows(repos, 'stream', 2)
+    repo, rows = next(parallel)
+    assert next(rows).pkgname == 'gcc'
+    assert [repo for repo, _ in parallel] == repos[1:]
+    with pytest.raises(KeyError):
+        for _, rows in builddb._repos_rows(repos, 'nonexistent', 2):
+            list(rows)
+
+
+def _built_rows(path, repos, incremental=False):
+    with datasource.SqliteDataSource(str(path), 'bulk') as source:
+        builddb.build_db(source, repos, incremental=incremental)
+        source.finish_creating()
+    with datasource.SqliteDataSource(str(path), 'read') as source:
+        rows = sorted(source.read())
+        properties = [list(source.read_properties(i.pkgname)) for i in rows]
+        return rows, properties
+
+
+def test_incremental_build_equals_full(tmp_path, monkeypatch):
+    repos = ['x86_64', 'musl/x86_64-musl']
+    indices = {repo: tmp_path / f'{i}.plist' for i, repo in enumerate(repos)}
+    for index in indices.values():
+        index.write_text(_INDEX)
+    monkeypatch.setattr(builddb, 'index_path', lambda repo: str(indices[repo]))
+    _built_rows(tmp_path / 'previous.db', repos)
+    indices['x86_64'].write_text(_INDEX.replace('12.2.0_2', '12.2.0_3'))
+    previous = datasource.SqliteDataSource(
+        str(tmp_path / 'previous.db'),
+        'read'
+    )
+    monkeypatch.setattr(datasource, 'existing', lambda: previous)
+    incremental = _built_rows(tmp_path / 'incremental.db', repos, True)
+    previous.close()
+    full = _built_rows(tmp_path / 'full.db', repos)
+    assert incremental == full
+    assert {row.pkgver for row in incremental[0]} == {
+        'gcc-12.2.0_2', 'gcc-12.2.0_3', 'void-docs-2023.01.28_1'
+    }
+
+
+def test_incremental_build_keeps_previous_readable(tmp_path, monkeypatch):
+    monkeypatch.setattr(builddb, 'index_path', lambda repo: str(index))
+    index = tmp_path / 'index.plist'
+    index.write_text(_INDEX)
+    path = str(tmp_path / 'previous.db')
+    _built_rows(path, ['x86_64'])
+    with closing(sqlite3.connect(path)) as connection:
+        connection.execute('pragma journal_mode = wal')
+    previous = datasource.SqliteDataSource(path, 'read')
+    monkeypatch.setattr(datasource, 'existing', lambda: previous)
+    with datasource.SqliteDataSource(str(tmp_path / 'new.db'), 'bulk') as new:
+        builddb.build_db(new, ['x86_64'], incremental=True)
+        with datasource.SqliteDataSource(path, 'read') as reader:
+            assert len(list(reader.read())) == 2
+        new.finish_creating()
+    previous.close()
+
+
+def test_incremental_build_without_previous(tmp_path, monkeypatch):
+    path = tmp_path / 'index.plist'
+    path.write_text(_INDEX)
+    monkeypatch.setattr(builddb, 'index_path', lambda repo: str(path))
+    monkeypatch.setattr(
+        builddb.config,
+        'DATASOURCE_ARGUMENTS',
+        f'{tmp_path / "missing.db"},read'
+    )
+    rows, _ = _built_rows(tmp_path / 'new.db', ['x86_64'], incremental=True)
+    assert len(rows) == 2
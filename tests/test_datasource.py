@@ -0,0 +1,301 @@
+# pkgs.void - web catalog of Void Linux packages.
+# Copyright (C) 2026 Piotr Wójcik <chocimier@tlen.pl>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import datetime
+import os
+import sqlite3
+from contextlib import closing
+
+import pytest
+
+import datasource
+from datasource import PackageRow, SqliteDataSource, to_json
+
+
+_DATES = [datetime.date(2023, 1, 28)]
+
+
+def _rows():
+    return [
+        PackageRow(
+            pkgver='gcc-12.2.0_2',
+            arch=arch,
+            repo=arch,
+            repodata={
+                'pkgver': 'gcc-12.2.0_2',
+                'short_desc': 'GNU Compiler Collection',
+                'homepage': 'http://gcc.gnu.org',
+            },
+            mainpkg='gcc',
+        )
+        for arch in ('x86_64', 'aarch64')
+    ] + [
+        PackageRow(
+            pkgver='libgcc-12.2.0_2',
+            arch='x86_64',
+            repo='x86_64',
+            repodata={'pkgver': 'libgcc-12.2.0_2'},
+            mainpkg='gcc',
+        ),
+        PackageRow(
+            pkgver='foo-1.0_1',
+            arch='unknown-unknown',
+            repo='',
+            templatedata={'short_desc': 'Foo', 'pkgname': 'foo'},
+            mainpkg='foo',
+        ),
+    ]
+
+
+def _build(path, mode):
+    source = SqliteDataSource(str(path), mode)
+    source.create_many(_rows(), _DATES)
+    source.update(
+        pkgname='gcc',
+        pkgver='gcc-12.2.0_2',
+        set_templatedata='{"short_desc": "GCC"}'
+    )
+    source.finish_creating()
+    return source
+
+
+def test_bulk_mode_fills_same_search_terms(tmp_path):
+    written = _build(tmp_path / 'write.sqlite3', 'write')
+    bulk = _build(tmp_path / 'bulk.sqlite3', 'bulk')
+    for term in ('gcc OR libgcc OR foo', 'GNU', 'gnu.org'):
+        assert list(bulk.search(term, [])) == list(written.search(term, []))
+    assert [i['name'] for i in bulk.search('foo', [])] == ['foo']
+
+
+def test_replace_repo_changes_only_differing_packages(tmp_path):
+    path = tmp_path / 'index.sqlite3'
+    with _build(path, 'write'):
+        pass
+    rows = [
+        PackageRow(
+            pkgver='gcc-13.1.0_1',
+            arch='x86_64',
+            repo='x86_64',
+            repodata={'pkgver': 'gcc-13.1.0_1', 'short_desc': 'GCC 13'},
+            mainpkg='gcc',
+        ),
+        PackageRow(
+            pkgver='bar-2.0_1',
+            arch='x86_64',
+            repo='x86_64',
+            repodata={'pkgver': 'bar-2.0_1', 'short_desc': 'Bar'},
+            mainpkg='bar',
+        ),
+    ]
+    with SqliteDataSource(str(path), 'delta') as source:
+        counts = source.replace_repo('x86_64', rows, _DATES)
+        source.finish_creating()
+        assert counts == {'inserted': 1, 'updated': 1, 'deleted': 1}
+        assert SqliteDataSource(str(path), 'read').exists(pkgname='libgcc')
+    source = SqliteDataSource(str(path), 'read')
+    assert not source.exists(pkgname='libgcc')
+    assert not list(source.same_template('libgcc'))
+    gcc, = source.read(pkgname='gcc', arch='x86_64')
+    assert gcc.pkgver == 'gcc-13.1.0_1'
+    assert gcc.templatedata == '{"short_desc": "GCC"}'
+    assert [i['name'] for i in source.search('13', [])] == ['gcc']
+    assert list(source.search('bar', [])) == [
+        {'name': 'bar', 'description': 'Bar'}
+    ]
+    assert not list(source.search('libgcc', []))
+
+
+def test_update_many_sets_values_of_matching_packages(tmp_path):
+    source = _build(tmp_path / 'index.sqlite3', 'write')
+    source.update_many(
+        ['pkgname'],
+        ['popularity'],
+        [('gcc', 10), ('foo', 3), ('missing', 7)],
+        repo='x86_64'
+    )
+    popularity = {
+        (row.pkgname, row.arch): row.popularity
+        for repo in ('x86_64', 'aarch64', '')
+        for row in source.read(repo=repo)
+    }
+    assert popularity == {
+        ('gcc', 'x86_64'): 10,
+        ('gcc', 'aarch64'): 0,
+        ('libgcc', 'x86_64'): 0,
+        ('foo', 'unknown-unknown'): 0,
+    }
+
+
+def _full_scans(source, query):
+    '''Returns tables that are scanned by query without index.'''
+    # pylint: disable=protected-access
+    source._cursor.execute(f'explain query plan {query}')
+    tables = ('packages', 'pkgnames', 'daily_hash', 'metapackages')
+    return [
+        detail
+        for *_, detail in source._cursor.fetchall()
+        if detail.split(' USING ')[0] in (f'SCAN {i}' for i in tables)
+        and 'INDEX' not in detail
+    ]
+
+
+def test_queries_do_not_scan_tables(tmp_path):
+    source = SqliteDataSource(str(tmp_path / 'index.sqlite3'), 'write')
+    source.create_many([
+        PackageRow(
+            pkgver=f'package{number}-1.0_1',
+            arch=arch,
+            repo=arch,
+            builddate=f'2023-01-{number % 28 + 1:02} 10:12',
+            mainpkg=f'package{number - number % 3}',
+            popularity=number,
+        )
+        for number in range(1000)
+        for arch in ('x86_64', 'aarch64')
+    ], _DATES)
+    source.finish_creating()
+    statements = []
+    # pylint: disable=protected-access
+    source._db.set_trace_callback(statements.append)
+    list(source.read(pkgname='gcc'))
+    list(source.read(pkgname='gcc', arch='x86_64'))
+    source.exists(pkgname='gcc', pkgver='gcc-12.2.0_2')
+    list(source.newest(10))
+    list(source.popular(10))
+    list(source.longest_names(10))
+    list(source.same_template('libgcc'))
+    list(source.of_day(_DATES[0]))
+    source._db.set_trace_callback(None)
+    assert len(statements) == 8
+    for statement in statements:
+        assert not _full_scans(source, statement), statement
+
+
+def test_search_pages_cover_all_results(tmp_path):
+    source = _build(tmp_path / 'index.sqlite3', 'write')
+    found = list(source.search('gcc OR libgcc OR foo', []))
+    assert len(found) > 2
+    pages = [
+        list(source.search('gcc OR libgcc OR foo', [], 2, offset))
+        for offset in range(0, len(found), 2)
+    ]
+    assert [i for page in pages for i in page] == found
+    assert [i['name'] for i in source.search('libg*', ['name'])] == ['libgcc']
+
+
+def test_pkgnames_group_packages_of_same_template(tmp_path):
+    source = _build(tmp_path / 'index.sqlite3', 'write')
+    assert list(source.same_template('libgcc')) == ['gcc', 'libgcc']
+    assert list(source.same_template('foo')) == ['foo']
+
+
+def test_page_digests_change_with_shown_data(tmp_path):
+    source = _build(tmp_path / 'index.sqlite3', 'write')
+    before = source.page_digests()
+    assert sorted(before) == ['foo', 'gcc', 'libgcc']
+    source.update(pkgname='foo', set_popularity=3)
+    after = source.page_digests()
+    assert [i for i in before if before[i] != after[i]] == ['foo']
+
+
+def test_read_properties_matches_repodata_over_templatedata(tmp_path):
+    for mode in ('write', 'bulk'):
+        source = _build(tmp_path / f'{mode}.sqlite3', mode)
+        source.update(
+            pkgname='libgcc',
+            set_repodata=to_json({
+                'pkgver': 'libgcc-12.2.0_2',
+                'installed_size': 0,
+                'run_depends': ['glibc>=2.36_1', 'gcc-12.2.0_2'],
+                'provides': [],
+            })
+        )
+        source.finish_creating()
+        found = {
+            row.arch: properties
+            for row, properties in source.read_properties('gcc')
+        }
+        assert found == {
+            'x86_64': {
+                'short_desc': 'GNU Compiler Collection',
+                'homepage': 'http://gcc.gnu.org',
+            },
+            'aarch64': {
+                'short_desc': 'GNU Compiler Collection',
+                'homepage': 'http://gcc.gnu.org',
+            },
+        }
+        (row, properties), = source.read_properties('libgcc')
+        assert row.pkgver == 'libgcc-12.2.0_2'
+        assert properties == {
+            'installed_size': 0,
+            'run_depends': ['glibc>=2.36_1', 'gcc-12.2.0_2'],
+            'provides': [],
+        }
+
+
+def test_factory_reopens_replaced_database(tmp_path, monkeypatch):
+    path = tmp_path / 'index.sqlite3'
+    with _build(path, 'write'):
+        pass
+    monkeypatch.setattr(
+        datasource.config, 'DATASOURCE_ARGUMENTS', f'{path},read'
+    )
+    source = datasource.factory()
+    assert datasource.factory() is source
+    assert source.exists(pkgname='libgcc')
+    with SqliteDataSource(str(tmp_path / 'new.sqlite3'), 'write') as new:
+        new.create_many(_rows()[:1], _DATES)
+        new.finish_creating()
+    os.replace(tmp_path / 'new.sqlite3', path)
+    assert datasource.factory() is not source
+    assert not datasource.factory().exists(pkgname='libgcc')
+
+
+@pytest.mark.parametrize('module', ['fts5', 'fts4'])
+def test_search_rejects_only_invalid_terms(tmp_path, monkeypatch, module):
+    monkeypatch.setattr(datasource, '_SEARCH_MODULE', module)
+    source = _build(tmp_path / 'index.sqlite3', 'write')
+    assert [i['name'] for i in source.search('foo', [])] == ['foo']
+    assert source.search('foo AND', []) == 'Invalid search term'
+    source._cursor.execute('drop table pkgnames')
+    with pytest.raises(sqlite3.OperationalError):
+        source.search('foo', [])
+
+
+@pytest.mark.parametrize('reading', [False, True])
+def test_delta_leaves_empty_write_ahead_log(tmp_path, reading):
+    # pylint: disable=consider-using-with
+    path = tmp_path / 'index.sqlite3'
+    with _build(path, 'write'):
+        pass
+    with closing(sqlite3.connect(path)) as connection:
+        connection.execute('pragma journal_mode = wal')
+    reader = SqliteDataSource(str(path), 'read') if reading else None
+    if reader:
+        assert reader.exists(pkgname='gcc', arch='x86_64')
+    with SqliteDataSource(str(path), 'delta') as source:
+        source.replace_repo('x86_64', [], _DATES)
+        source.finish_creating()
+    wal = tmp_path / 'index.sqlite3-wal'
+    assert not wal.exists() or wal.stat().st_size == 0
+    journal_mode = 'wal' if reading else 'delete'
+    with closing(sqlite3.connect(path)) as connection:
+        assert connection.execute('pragma journal_mode').fetchone() == (
+            journal_mode,
+        )
+    if reader:
+        assert not reader.exists(pkgname='gcc', arch='x86_64')
+        reader.close()
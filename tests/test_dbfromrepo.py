@@ -0,0 +1,158 @@
+# pkgs.void - web catalog of Void Linux packages.
+# Copyright (C) 2026 Piotr Wójcik <chocimier@tlen.pl>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import subprocess
+from datetime import date
+
+import pytest
+
+os.environ.setdefault('XBPS_DISTDIR', '')
+
+# pylint: disable=wrong-import-position
+import datasource  # noqa: E402
+import dbfromrepo  # noqa: E402
+
+
+def _git(distdir, *args):
+    return subprocess.run(
+        ['git', '-C', str(distdir), *args],
+        check=True,
+        stdout=subprocess.PIPE,
+    ).stdout.decode('utf-8').strip()
+
+
+def _commit(distdir):
+    _git(distdir, 'add', '--all')
+    _git(distdir, 'commit', '--quiet', '--allow-empty', '--message', 'x')
+    return _git(distdir, 'rev-parse', 'HEAD')
+
+
+@pytest.fixture(name='distdir')
+def distdir_fixture(tmp_path, monkeypatch):
+    for variable in ('AUTHOR', 'COMMITTER'):
+        monkeypatch.setenv(f'GIT_{variable}_NAME', 'test')
+        monkeypatch.setenv(f'GIT_{variable}_EMAIL', 'test@example.org')
+    distdir = tmp_path / 'void-packages'
+    for pkgname in ('foo', 'bar', 'baz'):
+        (distdir / 'srcpkgs' / pkgname).mkdir(parents=True)
+        (distdir / 'srcpkgs' / pkgname / 'template').write_text(
+            f'pkgname={pkgname}\n'
+        )
+    (distdir / 'srcpkgs' / 'foo-devel').symlink_to('foo')
+    (distdir / 'common').mkdir()
+    (distdir / 'common' / 'environment').write_text('')
+    (distdir / 'README.md').write_text('')
+    _git(distdir, 'init', '--quiet')
+    _commit(distdir)
+    monkeypatch.setattr(dbfromrepo, 'DISTDIR', str(distdir))
+    return distdir
+
+
+def test_changed_templates_of_srcpkgs(distdir):
+    previous = _git(distdir, 'rev-parse', 'HEAD')
+    (distdir / 'srcpkgs' / 'foo' / 'template').write_text('pkgname=foo\n#\n')
+    (distdir / 'srcpkgs' / 'foo' / 'patches').mkdir()
+    (distdir / 'srcpkgs' / 'foo' / 'patches' / 'fix.patch').write_text('')
+    (distdir / 'srcpkgs' / 'bar-doc').symlink_to('bar')
+    (distdir / 'srcpkgs' / 'foo-devel').unlink()
+    (distdir / 'README.md').write_text('changed')
+    _commit(distdir)
+    assert dbfromrepo.changed_templates(previous) == {
+        'foo', 'foo-devel', 'bar-doc'
+    }
+
+
+def test_changed_templates_include_deleted(distdir):
+    previous = _git(distdir, 'rev-parse', 'HEAD')
+    (distdir / 'srcpkgs' / 'baz' / 'template').unlink()
+    _commit(distdir)
+    assert dbfromrepo.changed_templates(previous) == {'baz'}
+
+
+def test_changed_templates_unchanged(distdir):
+    previous = _git(distdir, 'rev-parse', 'HEAD')
+    _commit(distdir)
+    assert dbfromrepo.changed_templates(previous) == set()
+
+
+@pytest.mark.parametrize('path', ['common/environment', 'xbps-src'])
+def test_changed_templates_global_paths(distdir, path):
+    previous = _git(distdir, 'rev-parse', 'HEAD')
+    (distdir / path).write_text('changed')
+    _commit(distdir)
+    assert dbfromrepo.changed_templates(previous) is None
+
+
+def test_changed_templates_unreachable_commit(distdir):
+    branch = _git(distdir, 'rev-parse', '--abbrev-ref', 'HEAD')
+    _git(distdir, 'checkout', '--quiet', '--orphan', 'other')
+    (distdir / 'srcpkgs' / 'foo' / 'template').write_text('pkgname=foo\n#\n')
+    unrelated = _commit(distdir)
+    _git(distdir, 'checkout', '--quiet', '--force', branch)
+    assert dbfromrepo.changed_templates(unrelated) is None
+    assert dbfromrepo.changed_templates('0' * 40) is None
+    assert dbfromrepo.changed_templates(None) is None
+
+
+def _previous_source(path, commit):
+    source = datasource.SqliteDataSource(str(path), 'write')
+    source.create_many([
+        datasource.PackageRow(
+            pkgname=pkgname,
+            pkgver=f'{pkgname}-1.0_1',
+            arch='unknown-unknown',
+            templatedata=datasource.to_json({'pkgname': pkgname}),
+            mainpkg=pkgname,
+            repo='',
+        )
+        for pkgname in ('foo', 'bar', 'baz')
+    ], [date(2026, 1, 1)])
+    source.add_auxiliary('templates_commit', commit)
+    source.finish_creating()
+    return source
+
+
+def test_previous_templates(distdir, tmp_path, monkeypatch):
+    previous = _git(distdir, 'rev-parse', 'HEAD')
+    source = _previous_source(tmp_path / 'previous.sqlite3', previous)
+    monkeypatch.setattr(datasource, 'existing', lambda: source)
+    (distdir / 'srcpkgs' / 'foo' / 'template').write_text('pkgname=foo\n#\n')
+    _commit(distdir)
+    assert dbfromrepo.previous_templates(['foo', 'bar', 'qux']) == {
+        'bar': {'pkgname': 'bar'},
+    }
+    (distdir / 'common' / 'environment').write_text('changed')
+    _commit(distdir)
+    assert not dbfromrepo.previous_templates(['foo', 'bar', 'qux'])
+    source.close()
+
+
+@pytest.mark.usefixtures('distdir')
+def test_previous_templates_unreachable_commit(tmp_path, monkeypatch):
+    source = _previous_source(tmp_path / 'previous.sqlite3', '0' * 40)
+    monkeypatch.setattr(datasource, 'existing', lambda: source)
+    assert not dbfromrepo.previous_templates(['foo', 'bar', 'baz'])
+    source.close()
+
+
+@pytest.mark.usefixtures('distdir')
+def test_previous_templates_without_database(tmp_path, monkeypatch):
+    monkeypatch.setattr(
+        datasource.config,
+        'DATASOURCE_ARGUMENTS',
+        f'{tmp_path / "missing.sqlite3"},read'
+    )
+    assert not dbfromrepo.previous_templates(['foo', 'bar', 'baz'])
@@ -0,0 +1,56 @@
+# pkgs.void - web catalog of Void Linux packages.
+# Copyright (C) 2026 Piotr Wójcik <chocimier@tlen.pl>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import pytest
+
+import present
+from settings import config
+
+
+@pytest.mark.parametrize('value,html', [
+    ('gcc', '<a href="{root}/package/gcc">gcc</a>'),
+    ('binutils>=0', '<a href="{root}/package/binutils">binutils</a>'),
+    (
+        'libgcc-devel>=12.2.0_2',
+        '<a href="{root}/package/libgcc-devel">libgcc-devel</a>'
+        '&gt;=12.2.0<sub>_2</sub>'
+    ),
+    (
+        'glibc-32bit>=2.36_1',
+        '<a href="{root}/package/glibc-32bit">glibc-32bit</a>'
+        '&gt;=2.36<sub>_1</sub>'
+    ),
+    (
+        'foo-32bit-1.0_3',
+        '<a href="{root}/package/foo-32bit">foo-32bit</a>-1.0<sub>_3</sub>'
+    ),
+    (
+        'python3-foo<2.0',
+        '<a href="{root}/package/python3-foo">python3-foo</a>&lt;2.0'
+    ),
+    (
+        'libc++-devel>=1:2_1',
+        '<a href="{root}/package/libc%2B%2B-devel">libc++-devel</a>'
+        '&gt;=1:2<sub>_1</sub>'
+    ),
+    (
+        'a<b>c&d-1.0_1',
+        '<a href="{root}/package/a%3Cb">a&lt;b</a>&gt;c&amp;d-1.0<sub>_1</sub>'
+    ),
+])
+def test_as_package(value, html):
+    expected = html.format(root=config.ROOT_URL)
+    assert present.as_package(value) == expected
+    assert present.as_package.__wrapped__(value) == expected
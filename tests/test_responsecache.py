@@ -0,0 +1,100 @@
+# pkgs.void - web catalog of Void Linux packages.
+# Copyright (C) 2026 Piotr Wójcik <chocimier@tlen.pl>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import threading
+
+from responsecache import DiskCache, ResponseCache
+
+
+def test_cache_evicts_least_recently_used_over_budget():
+    page = 'x' * 1000
+    cache = ResponseCache(3 * ResponseCache._sizeof(('/a/', None), page))
+    for url in ('/a/', '/b/', '/c/'):
+        assert cache.get('1', (url, None)) is None
+        cache.put('1', (url, None), page)
+    assert cache.get('1', ('/a/', None)) == page
+    cache.put('1', ('/d/', None), page)
+    assert cache.get('1', ('/b/', None)) is None
+    assert cache.get('1', ('/a/', None)) == page
+    stats = cache.stats()
+    assert stats['evictions'] == 1
+    assert stats['entries'] == 3
+    assert stats['size'] <= stats['budget']
+
+
+def test_cache_forgets_pages_of_previous_generation():
+    cache = ResponseCache(1 << 20)
+    cache.get('1', ('/a/', None))
+    cache.put('1', ('/a/', None), 'old')
+    assert cache.get('2', ('/a/', None)) is None
+    cache.put('1', ('/a/', None), 'old')
+    assert cache.get('2', ('/a/', None)) is None
+    assert cache.stats()['size'] == 0
+
+
+def test_disk_cache_is_shared_and_evicts_oldest(tmp_path):
+    first = DiskCache(str(tmp_path), 3000)
+    second = DiskCache(str(tmp_path), 3000)
+    for number, url in enumerate(('/a/', '/b/', '/c/', '/d/')):
+        first.put('1', (url, None), str(number) * 1000)
+        os.utime(first._filename('1', (url, None)), (number, number))
+    assert second.get('1', ('/a/', None)) is None
+    assert second.get('1', ('/d/', None)) == '3' * 1000
+    assert first.stats()['size'] <= 3000
+    assert second.get('2', ('/d/', None)) is None
+    assert os.listdir(tmp_path) == []
+
+
+def test_disk_caches_of_different_generations_never_fail(tmp_path):
+    old = DiskCache(str(tmp_path), 3000)
+    new = DiskCache(str(tmp_path), 3000)
+
+    def use(cache, generation):
+        for number in range(200):
+            key = (f'/{number % 7}/', None)
+            page = cache.get(generation, key)
+            assert page in (None, generation * 500)
+            cache.put(generation, key, generation * 500)
+
+    threads = [
+        threading.Thread(target=use, args=(cache, generation))
+        for cache, generation in ((old, '1'), (new, '2'))
+    ]
+    failures = []
+    threading.excepthook = failures.append
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        threading.excepthook = threading.__excepthook__
+    assert not failures
+
+
+def test_disk_cache_put_ignores_directory_removed_meanwhile(
+        tmp_path, monkeypatch):
+    old = DiskCache(str(tmp_path), 3000)
+    new = DiskCache(str(tmp_path), 3000)
+    makedirs = os.makedirs
+
+    def removed_meanwhile(path, **kwargs):
+        makedirs(path, **kwargs)
+        new.get('2', ('/a/', None))
+
+    monkeypatch.setattr(os, 'makedirs', removed_meanwhile)
+    old.put('1', ('/a/', None), 'old')
+    assert old.get('1', ('/a/', None)) is None
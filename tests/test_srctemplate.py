@@ -0,0 +1,173 @@
+# pkgs.void - web catalog of Void Linux packages.
+# Copyright (C) 2026 Piotr Wójcik <chocimier@tlen.pl>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import pytest
+
+from srctemplate import UnsupportedTemplate, parse_show, parse_template
+
+
+_JQ_TEMPLATE = '''# Template file for 'jq'
+pkgname=jq
+version=1.6
+revision=2
+build_style=gnu-configure
+configure_args="--disable-docs"
+makedepends="oniguruma-devel"
+short_desc="Command-line JSON processor"
+maintainer="Orphaned <orphan@voidlinux.org>"
+license="MIT, CC-BY-3.0"
+homepage="https://stedolan.github.io/jq/"
+distfiles="https://github.com/stedolan/jq/releases/download/jq-${version}/jq-${version}.tar.gz"
+checksum=5de8c8e29aaa3fb9cc6b47bb27299f271354ebb72514e3accadc7d38b5bbaa72
+
+post_install() {
+	vlicense COPYING
+}
+
+libjq_package() {
+	short_desc+=" - runtime library"
+	pkg_install() {
+		vmove "usr/lib/*.so.*"
+	}
+}
+'''
+
+
+_JQ_SHOW = '''pkgname:	jq
+version:	1.6
+revision:	2
+distfiles:	https://github.com/stedolan/jq/releases/download/jq-1.6/jq-1.6.tar.gz
+checksum:	5de8c8e29aaa3fb9cc6b47bb27299f271354ebb72514e3accadc7d38b5bbaa72
+maintainer:	Orphaned <orphan@voidlinux.org>
+Upstream URL:	https://stedolan.github.io/jq/
+License(s):	MIT, CC-BY-3.0
+build_style:	gnu-configure
+configure_args:	--disable-docs
+short_desc:	Command-line JSON processor
+subpackages:	libjq
+makedepends:	oniguruma-devel
+'''
+
+
+_FOO_TEMPLATE = '''# Template file for 'foo-bin'
+pkgname=foo-bin
+version=2.0.1
+revision=3
+archs="x86_64"
+_site=https://foo.example.com
+short_desc='Proprietary "foo" tool'
+maintainer="John Doe <john@example.org>"
+license="custom:Proprietary"
+homepage="${_site}"
+distfiles="${_site}/${pkgname}-${version}.tar.gz
+ ${_site}/extra-$version.tar.gz"
+checksum="aaaa
+ bbbb"
+restricted=yes  # license forbids redistribution
+nopie=yes
+
+do_install() { vbin foo; }
+'''
+
+
+_FOO_SHOW = '''pkgname:	foo-bin
+version:	2.0.1
+revision:	3
+distfiles:	https://foo.example.com/foo-bin-2.0.1.tar.gz
+distfiles:	https://foo.example.com/extra-2.0.1.tar.gz
+checksum:	aaaa
+checksum:	bbbb
+maintainer:	John Doe <john@example.org>
+Upstream URL:	https://foo.example.com
+License(s):	custom:Proprietary
+short_desc:	Proprietary "foo" tool
+restricted:	yes
+'''
+
+
+_BAR_TEMPLATE = '''# Template file for 'bar'
+pkgname=bar
+version=3.1
+revision=1
+short_desc="Bar replacing baz"
+maintainer="Jane Doe <jane@example.org>"
+license="BSD-2-Clause"
+homepage="https://bar.example.org"
+restricted=yes
+conflicts="baz>=0 qux<2"
+provides="baz-${version}_${revision}"
+reverts="3.2_1"
+'''
+
+
+_BAR_SHOW = '''pkgname:	bar
+version:	3.1
+revision:	1
+maintainer:	Jane Doe <jane@example.org>
+Upstream URL:	https://bar.example.org
+License(s):	BSD-2-Clause
+short_desc:	Bar replacing baz
+restricted:	yes
+conflicts:	baz>=0
+conflicts:	qux<2
+provides:	baz-3.1_1
+reverts:	3.2_1
+'''
+
+
+# Fields of xbps-src show kept by catalog, not left to xbps-src
+_CATALOG_FIELDS = (
+    'pkgname',
+    'version',
+    'revision',
+    'maintainer',
+    'Upstream URL',
+    'License(s)',
+    'short_desc',
+    'restricted',
+    'distfiles',
+    'conflicts',
+    'provides',
+    'reverts',
+)
+
+
+@pytest.mark.parametrize('template,show', [
+    (_JQ_TEMPLATE, _JQ_SHOW),
+    (_FOO_TEMPLATE, _FOO_SHOW),
+    (_BAR_TEMPLATE, _BAR_SHOW),
+])
+def test_parse_template_agrees_with_xbps_src(template, show):
+    native = parse_template(template)
+    by_xbps_src = parse_show(show)
+    for field in _CATALOG_FIELDS:
+        assert native.get(field, []) == by_xbps_src.get(field, []), field
+
+
+@pytest.mark.parametrize('line', [
+    'distfiles="${PYPI_SITE}/f/foo/foo-${version}.tar.gz"',
+    'wrksrc="${pkgname}-${version%.*}"',
+    'version=$(date +%Y)',
+    'version=`date +%Y`',
+    'short_desc+=" - extra"',
+    'changelog="https://example.org/NEWS"',
+    'case "$XBPS_TARGET_MACHINE" in\n\t*-musl) broken=yes;;\nesac',
+    'if [ "$CROSS_BUILD" ]; then\n\thostmakedepends+=" foo"\nfi',
+    'vopt_if foo bar',
+    'short_desc="unterminated',
+])
+def test_parse_template_falls_back(line):
+    with pytest.raises(UnsupportedTemplate):
+        parse_template(_JQ_TEMPLATE + line + '\n')
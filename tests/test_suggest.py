@@ -0,0 +1,47 @@
+# pkgs.void - web catalog of Void Linux packages.
+# Copyright (C) 2026 Piotr Wójcik <chocimier@tlen.pl>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from suggest import SuggestionIndex
+
+
+_INDEX = SuggestionIndex([
+    ('firefox', 'Mozilla Firefox web browser', 500),
+    ('firefox-esr', 'Mozilla Firefox ESR', 40),
+    ('firefox-i18n-pl', 'Polish language pack', 0),
+    ('fish-shell', 'User friendly shell', 100),
+    ('gcc', 'GNU Compiler Collection', 900),
+    ('gc', 'Garbage collector', None),
+])
+
+
+def _names(query, limit=10):
+    return [pkgname for pkgname, _ in _INDEX.suggest(query, limit)]
+
+
+def test_suggest_prefixed_names_by_popularity():
+    assert _names('fi') == [
+        'firefox', 'fish-shell', 'firefox-esr', 'firefox-i18n-pl'
+    ]
+    assert _names('FIRE', 2) == ['firefox', 'firefox-esr']
+    assert _INDEX.suggest('gc', 1) == [('gcc', 'GNU Compiler Collection')]
+    assert _names(' ') == []
+
+
+def test_suggest_names_with_typo():
+    assert _names('firefx') == ['firefox']
+    assert _names('frieofx') == []
+    assert _names('fierfox') == ['firefox']
+    assert _names('gcx') == ['gcc', 'gc']
+    assert _names('fish-shel') == ['fish-shell']
@@ -6,7 +6,8 @@ import base64
 import datetime
 import lxml.etree
 
-__all__ = ['parse', 'factory', 'dumps', 'dict', 'array']
+__all__ = ['parse', 'iterparse', 'factory', 'to_plain', 'dumps', 'dict',
+           'array']
 
 template = ('<?xml version="1.0" encoding="UTF-8"?>\n'
             '<!DOCTYPE plist PUBLIC "-//Apple//DTD PLIST 1.0//EN" '
@@ -45,18 +46,30 @@ class PListArray(object):
     def append(self, other):
         self.elem.append(collapse(other))
 
+    def to_list(self, types=None):
+        return to_plain(self.elem, types)
+
 
 class PListDict(object):
     def __init__(self, elem):
         self.elem = elem
+        self._index = None
 
     def __len__(self):
         return len(self.elem) / 2
 
+    def _valueIndex(self):
+        """Map of keys to value elements, built on first lookup."""
+        if self._index is None:
+            index = {}
+            it = iter(self.elem)
+            for key in it:
+                index.setdefault(key.text, next(it))
+            self._index = index
+        return self._index
+
     def _findValue(self, key):
-        for child in self.elem:
-            if child.tag == 'key' and child.text == key:
-                return child.getnext()
+        return self._valueIndex().get(key)
 
     def __getitem__(self, key):
         elem = self._findValue(str(key))
@@ -66,9 +79,10 @@ class PListDict(object):
 
     def __setitem__(self, key, value):
         elem = self._findValue(key)
-        if elem:
+        if elem is not None:
             self.elem.remove(elem.getprevious())
             self.elem.remove(elem)
+        self._index = None
         collapsed = collapse(value)
         self.elem.append(_elem('key', str(key)))
         self.elem.append(collapsed)
@@ -80,7 +94,7 @@ class PListDict(object):
             return default
 
     def __iter__(self):
-        return (e.text for e in self.elem.findall('./key'))
+        return (e.text for e in self.elem.iterchildren('key'))
     iterkeys = __iter__
 
     def keys(self):
@@ -96,6 +110,9 @@ class PListDict(object):
         it = iter(self.elem)
         return ((elem.text, factory(next(it))) for elem in it)
 
+    def to_dict(self, types=None):
+        return to_plain(self.elem, types)
+
 
 def collapse(v):
     if isinstance(v, str):
@@ -141,6 +158,55 @@ def factory(elem):
     return TYPES[elem.tag](elem)
 
 
+PLAIN_TYPES = {
+    tag: convert
+    for tag, convert in TYPES.items()
+    if tag not in ('array', 'dict')
+}
+
+
+def to_plain(elem, types=None):
+    """Given a PList value element, return its value built of standard
+    Python types: dict, list, str, int, float, bool and bytes.
+    types maps scalar tags to converters, defaulting to PLAIN_TYPES."""
+    if types is None:
+        types = PLAIN_TYPES
+    tag = elem.tag
+    if tag == 'dict':
+        it = iter(elem)
+        return {key.text: to_plain(next(it), types) for key in it}
+    if tag == 'array':
+        return [to_plain(e, types) for e in elem]
+    return types[tag](elem)
+
+
+def iterparse(fp, types=None):
+    """Iterate over (key, value) pairs of the top-level <dict> of a plist,
+    converting values with to_plain. Elements are discarded as soon as
+    they are consumed, so memory use does not grow with document size."""
+    depth = 0
+    key = None
+    for event, elem in lxml.etree.iterparse(fp, events=('start', 'end')):
+        if event == 'start':
+            depth += 1
+            if depth == 1 and elem.tag != 'plist':
+                raise ValueError('root element is not a <plist>')
+            if depth == 2 and elem.tag != 'dict':
+                raise ValueError('top-level element is not a <dict>')
+            continue
+        depth -= 1
+        if depth != 2:
+            continue
+        if elem.tag == 'key':
+            key = elem.text
+        else:
+            yield key, to_plain(elem, types)
+        elem.clear()
+        parent = elem.getparent()
+        while elem.getprevious() is not None:
+            del parent[0]
+
+
 def parse(fp):
     root = lxml.etree.parse(fp).getroot()
     if root.tag != 'plist':
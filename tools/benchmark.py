@@ -0,0 +1,426 @@
+#!/usr/bin/env python3
+
+# pkgs.void - web catalog of Void Linux packages.
+# Copyright (C) 2026 Piotr Wójcik <chocimier@tlen.pl>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, version 3.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+'''Benchmarks of database building stages on synthetic data.'''
+
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+from contextlib import contextmanager
+from xml.sax.saxutils import escape
+
+sys.path.append('.')
+
+import datasource # noqa, pylint: disable=wrong-import-position
+import popularity as popularity_stage # noqa, pylint: disable=wrong-import-position
+import present # noqa, pylint: disable=wrong-import-position
+import rsyncdata # noqa, pylint: disable=wrong-import-position
+import voidhtml # noqa, pylint: disable=wrong-import-position
+from sink import now # noqa, pylint: disable=wrong-import-position
+from thirdparty import plistop # noqa, pylint: disable=wrong-import-position
+
+
+_BENCHMARKS = {}
+
+
+def benchmark(func):
+    _BENCHMARKS[func.__name__] = func
+    return func
+
+
+@contextmanager
+def timed(name):
+    start = time.perf_counter()
+    yield
+    print(f'{name}: {time.perf_counter() - start:.3f}s')
+
+
+def _plist_value(value):
+    if isinstance(value, bool):
+        return '<true/>' if value else '<false/>'
+    if isinstance(value, int):
+        return f'<integer>{value}</integer>'
+    if isinstance(value, list):
+        items = ''.join(_plist_value(i) for i in value)
+        return f'<array>{items}</array>'
+    return f'<string>{escape(value)}</string>'
+
+
+def synthetic_package(number):
+    pkgname = f'package{number}'
+    pkgver = f'{pkgname}-1.{number % 10}_1'
+    return pkgname, {
+        'architecture': 'x86_64',
+        'build-date': '2023-01-28 10:12 CET',
+        'filename-sha256': f'{number:064x}',
+        'filename-size': 1000 + number,
+        'homepage': f'https://example.org/{pkgname}',
+        'installed_size': 4096 * (number % 50),
+        'license': 'MIT',
+        'maintainer': 'Someone <someone@example.org>',
+        'pkgver': pkgver,
+        'preserve': bool(number % 2),
+        'run_depends': [f'package{(number + i) % 997}>=0' for i in range(5)],
+        'shlib-provides': [f'lib{pkgname}.so.1'],
+        'shlib-requires': ['libc.so.6', 'libm.so.6'],
+        'short_desc': f'Synthetic package number {number}',
+        'source-revisions': f'{pkgname}:0123abcd',
+    }
+
+
+def write_synthetic_index(path, count):
+    with open(path, 'w') as index:
+        index.write(
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<plist version="1.0">\n<dict>\n'
+        )
+        for number in range(count):
+            pkgname, dictionary = synthetic_package(number)
+            index.write(f'<key>{pkgname}</key><dict>')
+            for key, value in dictionary.items():
+                index.write(f'<key>{key}</key>{_plist_value(value)}')
+            index.write('</dict>\n')
+        index.write('</dict>\n</plist>\n')
+
+
+@contextmanager
+def synthetic_index(path, count=15000):
+    if path:
+        yield path
+        return
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'index.plist')
+        write_synthetic_index(path, count)
+        yield path
+
+
+def _linear_lookup(pkgdict, key):
+    for child in pkgdict.elem:
+        if child.tag == 'key' and child.text == key:
+            return plistop.factory(child.getnext())
+    raise KeyError(key)
+
+
+def _recursive_std_types(value):
+    if isinstance(value, plistop.PListArray):
+        return [_recursive_std_types(i) for i in value]
+    if isinstance(value, plistop.PListDict):
+        return {k: _recursive_std_types(value[k]) for k in value}
+    return value
+
+
+@benchmark
+def plist(path=None):
+    '''PListDict key lookup and conversion; optional path of index.plist'''
+    with synthetic_index(path) as index_path:
+        with open(index_path, 'rb') as xml_file:
+            repodata = plistop.parse(xml_file)
+    packages = [pkgdict for _, pkgdict in repodata.iteritems()]
+    keys = [list(pkgdict) for pkgdict in packages]
+    print(f'{len(packages)} packages')
+    with timed('linear lookup of every key'):
+        for pkgdict, pkgkeys in zip(packages, keys):
+            for key in pkgkeys:
+                _linear_lookup(pkgdict, key)
+    with timed('indexed lookup of every key'):
+        for pkgdict, pkgkeys in zip(packages, keys):
+            for key in pkgkeys:
+                pkgdict[key]  # pylint: disable=pointless-statement
+    with timed('recursive conversion'):
+        for pkgdict in packages:
+            _recursive_std_types(pkgdict)
+    with timed('to_dict'):
+        for pkgdict in packages:
+            pkgdict.to_dict()
+
+
+def synthetic_rows(count):
+    for number in range(count):
+        pkgname, dictionary = synthetic_package(number)
+        yield datasource.PackageRow(
+            arch='x86_64',
+            pkgname=pkgname,
+            pkgver=dictionary['pkgver'],
+            repodata=dictionary,
+            mainpkg=pkgname,
+            depends_count=len(dictionary['run_depends']),
+            repo='x86_64'
+        )
+
+
+@contextmanager
+def temporary_database():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'index.sqlite3')
+        with datasource.SqliteDataSource(path, 'write') as source:
+            yield source
+
+
+@benchmark
+def insert(count='100000'):
+    '''create per row against create_many; optional count of rows'''
+    rows = list(synthetic_rows(int(count)))
+    dates = [now().date()]
+    print(f'{len(rows)} rows')
+    with temporary_database() as source:
+        with timed('create per row'):
+            for row in rows:
+                source.create(row, dates)
+    with temporary_database() as source:
+        with timed('create_many'):
+            source.create_many(rows, dates)
+
+
+_ARCHS = (
+    'aarch64', 'aarch64-musl', 'armv6l', 'armv6l-musl', 'armv7l',
+    'armv7l-musl', 'i686', 'x86_64', 'x86_64-musl',
+)
+
+
+def synthetic_arch_rows(count):
+    '''Yields rows of count packages built for every arch, with repodata
+    and templatedata of size close to real ones.'''
+    for number in range(count):
+        pkgname, dictionary = synthetic_package(number)
+        dictionary['run_depends'] = [
+            f'package{(number + i) % 997}>=1.{i}_1' for i in range(20)
+        ]
+        dictionary['shlib-requires'] = [
+            f'lib{i}.so.{number % 7}' for i in range(60)
+        ]
+        dictionary['conf_files'] = [
+            f'/etc/{pkgname}/{i}.conf' for i in range(5)
+        ]
+        templatedata = {
+            name: f'{name} of {pkgname} ' * 3
+            for name in (
+                'build_style', 'checksum', 'configure_args', 'hostmakedepends',
+                'makedepends', 'make_check', 'revision', 'version', 'wrksrc',
+            )
+        }
+        templatedata['distfiles'] = [f'https://example.org/{pkgname}.tar.gz']
+        for arch in _ARCHS:
+            yield datasource.PackageRow(
+                arch=arch,
+                pkgname=pkgname,
+                pkgver=dictionary['pkgver'],
+                repodata=dictionary,
+                templatedata=templatedata,
+                mainpkg=pkgname,
+                depends_count=len(dictionary['run_depends']),
+                repo=arch
+            )
+
+
+@benchmark
+def properties(count='3000'):
+    '''read with decoding json against read_properties of package
+    built for every arch; optional count of packages'''
+    pkgnames = [synthetic_package(i)[0] for i in range(int(count))]
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'index.sqlite3')
+        with datasource.SqliteDataSource(path, 'bulk') as source:
+            source.create_many(synthetic_arch_rows(len(pkgnames)), [])
+            source.finish_creating()
+        with datasource.SqliteDataSource(path, 'read') as source:
+            with timed('read and decode json'):
+                for pkgname in pkgnames:
+                    for row in source.read(pkgname=pkgname):
+                        pkg = datasource.from_json(row.templatedata)
+                        pkg.update(datasource.from_json(row.repodata))
+            with timed('read_properties'):
+                for pkgname in pkgnames:
+                    for _ in source.read_properties(pkgname):
+                        pass
+
+
+def write_synthetic_popcorn(path, count):
+    with open(path, 'w') as popcorn:
+        json.dump({
+            'UniqueInstalls': 2000,
+            'Packages': {
+                synthetic_package(number)[0]: number % 2000 + 1
+                for number in range(count)
+            },
+        }, popcorn)
+
+
+@benchmark
+def popularity(count='15000'):
+    '''update per package against update_many; optional count of packages'''
+    rows = list(synthetic_rows(int(count)))
+    dates = [now().date()]
+    print(f'{len(rows)} packages')
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'popcorn.json')
+        write_synthetic_popcorn(path, len(rows))
+        with temporary_database() as source:
+            source.create_many(rows, dates)
+            with timed('update per package'):
+                data = popularity_stage.load(path)
+                source.update(set_popularity=0)
+                for pkgname, copies in data['Packages'].items():
+                    source.update(pkgname=pkgname, set_popularity=copies)
+        with temporary_database() as source:
+            source.create_many(rows, dates)
+            with timed('update_many'):
+                popularity_stage.build_db(source, path)
+
+
+def synthetic_listing(count):
+    for number in range(count):
+        pkgname, dictionary = synthetic_package(number)
+        yield (
+            f'-rw-r--r--{1000 + number:>15,} '
+            f'2023/01/{number % 28 + 1:02}'
+            f' {number % 24:02}:{number % 60:02}:00 '
+            f'{dictionary["pkgver"]}.x86_64.xbps\n'
+        )
+        if pkgname.endswith('0'):
+            yield (
+                f'-rw-r--r--{512:>15,} 2023/01/28 10:12:00 '
+                f'{dictionary["pkgver"]}.x86_64.xbps.sig2\n'
+            )
+
+
+def _strptime_builddates(repo, listing):
+    # pylint: disable=protected-access
+    for line in listing:
+        record = rsyncdata._stats(line.strip())
+        if record and rsyncdata._is_of_arch(record.name, repo):
+            date = datetime.strptime(
+                record.date + ' ' + record.time,
+                '%Y/%m/%d %H:%M:%S'
+            )
+            yield (
+                rsyncdata._pkgver_from_filename(record.name),
+                date.strftime('%Y-%m-%d %H:%M')
+            )
+
+
+@benchmark
+def rsync(count='100000', per_line='1000'):
+    '''build dates update per line against update_many; optional count
+    of files and count of lines updated one by one'''
+    # pylint: disable=protected-access
+    rows = list(synthetic_rows(int(count)))
+    listing = list(synthetic_listing(len(rows)))
+    dates = [now().date()]
+    print(f'{len(listing)} lines')
+    with timed('parsing with strptime'):
+        for _ in _strptime_builddates('x86_64', listing):
+            pass
+    with timed('parsing with slice'):
+        for _ in rsyncdata._builddates('x86_64', listing):
+            pass
+    with temporary_database() as source:
+        source.create_many(rows, dates)
+        with timed(f'update per line, first {per_line} lines'):
+            for pkgver, builddate in _strptime_builddates(
+                    'x86_64', listing[:int(per_line)]):
+                source.update(
+                    pkgver=pkgver,
+                    repo='x86_64',
+                    builddate='',
+                    set_builddate=builddate
+                )
+    with temporary_database() as source:
+        source.create_many(rows, dates)
+        with timed('update_many'):
+            rsyncdata._process_repo(source, 'x86_64', listing)
+
+
+def synthetic_big_package(count, depends):
+    '''Returns row of package depending on, providing and conflicting
+    with many of count synthetic packages.'''
+    pkgname, dictionary = synthetic_package(count)
+    pkgname = 'big-' + pkgname
+    dictionary['pkgver'] = f'{pkgname}-1.0_1'
+    dictionary['run_depends'] = [
+        f'package{i % count}>=1.{i % 10}_{i % 3 + 1}' for i in range(depends)
+    ]
+    dictionary['provides'] = [f'virtual{i}-1_1' for i in range(depends // 3)]
+    dictionary['conflicts'] = [
+        f'package{i % count}<1.{i % 10}_1' for i in range(depends // 3)
+    ]
+    return datasource.PackageRow(
+        arch='x86_64',
+        pkgname=pkgname,
+        pkgver=dictionary['pkgver'],
+        repodata=dictionary,
+        mainpkg=pkgname,
+        depends_count=len(dictionary['run_depends']),
+        repo='x86_64'
+    )
+
+
+@benchmark
+def page(depends='400', count='1000', repeat='20'):
+    '''page_generator of package with many dependencies, with formatted
+    dependencies remembered or not; optional count of dependencies,
+    of packages and of renders'''
+    rows = list(synthetic_rows(int(count)))
+    big = synthetic_big_package(int(count), int(depends))
+    repodata = json.loads(big.repodata)
+    values = [
+        *repodata['run_depends'],
+        *repodata['provides'],
+        *repodata['conflicts'],
+    ]
+    print(f'{len(values)} dependencies, provides and conflicts')
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'index.sqlite3')
+        with datasource.SqliteDataSource(path, 'write') as source:
+            source.create_many([*rows, big], [now().date()])
+            source.finish_creating()
+        with datasource.SqliteDataSource(path, 'read') as source:
+            voidhtml.page_generator(big.pkgname, source=source)
+            with timed(f'as_package, {repeat} times without memo'):
+                for _ in range(int(repeat)):
+                    for value in values:
+                        present.as_package.__wrapped__(value)
+            with timed(f'page_generator, {repeat} times'):
+                for _ in range(int(repeat)):
+                    voidhtml.page_generator(big.pkgname, source=source)
+            with timed(
+                f'page_generator, {repeat} times, forgetting formatted'
+            ):
+                for _ in range(int(repeat)):
+                    present.as_package.cache_clear()
+                    voidhtml.page_generator(big.pkgname, source=source)
+
+
+def usage(status):
+    print(f'usage: {sys.argv[0]} benchmark [arguments]', file=sys.stderr)
+    for name, func in _BENCHMARKS.items():
+        print(f'  {name}: {func.__doc__}', file=sys.stderr)
+    sys.exit(status)
+
+
+def main(*args):
+    try:
+        func = _BENCHMARKS[args[0]]
+    except (IndexError, KeyError):
+        usage(1)
+    func(*args[1:])
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
@@ -23,6 +23,7 @@ import timeit
 import gprof2dot
 
 sys.path.append('.')
+import datasource # noqa, pylint: disable=wrong-import-position
 import voidhtml # noqa, pylint: disable=wrong-import-position,unused-import
 
 
@@ -70,6 +71,8 @@ def _timeit(func):
 
 def _profile_run(code):
     cProfile.run(code, filename='profile.log')
+    cache = datasource.query_cache_info()
+    print(f"query cache: {cache['hits']} hits, {cache['misses']} misses")
     gprof2dot.main([
         '-f', 'pstats',
         '--color-nodes-by-selftime',
@@ -23,6 +23,8 @@ templates=yes
 updates=
 popularity=yes
 builddate=yes
+delta=
+jobs="$(nproc 2>/dev/null || echo 1)"
 
 path="$(realpath "$(dirname "$0")")"
 dir="$(basename "$path")"
@@ -37,6 +39,7 @@ do
         -P) popularity= ;;
         -R) repodata= ;;
         -T) templates= ;;
+        -i) delta=yes ;;
         -t) templates=yes ;;
         -u) updates=yes ;;
         *) break
@@ -44,6 +47,14 @@ do
     shift
 done
 
+# In place update changes only packages of repositories in current database
+if [ "$delta" ]; then
+    templates=
+    updates=
+    popularity=
+    builddate=
+fi
+
 mirror="$(./settings.py REPODATA_MIRROR)"
 rsyncmirror="$(./settings.py RSYNC_MIRROR)"
 popcornmirror="$(./settings.py POPCORN_MIRROR)"
@@ -112,13 +123,28 @@ fi
 
 cd .. || exit 1
 
-rm -f "$newindex"
-[ "$repodata" ] && ./builddb.py $repos
-[ "$templates" ] && ./dbfromrepo.py $repos
-[ "$updates" ] && ./updates.py $repos
-[ "$popularity" ] && ./popularity.py
-[ "$builddate" ] && ./rsyncdata.py $repos
-
-mv "$newindex" "$index"
+python -c 'import present; present.precompile()'
+
+if [ "$delta" ]; then
+    [ "$repodata" ] && ./builddb.py --delta --ingest stream --jobs "$jobs" $repos
+    ./prerender.py --jobs "$jobs"
+else
+    rm -f "$newindex"
+    [ "$repodata" ] && ./builddb.py --ingest stream --jobs "$jobs" --incremental $repos
+    [ "$templates" ] && ./dbfromrepo.py --jobs "$jobs" $repos
+    [ "$updates" ] && ./updates.py $repos
+    [ "$popularity" ] && ./popularity.py
+    [ "$builddate" ] && ./rsyncdata.py $repos
+    # pages of new database are published right after it replaces old one
+    ./prerender.py --jobs "$jobs" --temporary || exit 1
+
+    # database replaced by new file must not leave changes behind
+    if [ -s "$index-wal" ]; then
+        echo "$index-wal is not empty, run $0 -i to checkpoint it" >&2
+        exit 1
+    fi
+    mv "$newindex" "$index"
+fi
 
+./prerender.py --publish
 python -c 'import voidhtml; print(voidhtml.list_all())' > "$generated"/all.html
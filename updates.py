@@ -16,9 +16,10 @@
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 import sys
-from collections import namedtuple
+from collections import defaultdict, namedtuple
 
 import datasource
+from sink import Stages
 
 
 UpdateRow = namedtuple(
@@ -42,16 +43,39 @@ def parse(lines):
             yield UpdateRow(*fields[:len(UpdateRow._fields)])
 
 
-def build_db(source, repos):
-    del repos
-    raw = load()
-    updates = parse(raw)
+def upstream_versions(updates):
+    '''Returns all new versions of packages, in order of appearance,
+    by pkgname.'''
+    versions = defaultdict(list)
     for update in updates:
-        source.update(
-            pkgname=update.pkgname,
-            set_upstreamver=update.newversion
+        if update.newversion not in versions[update.pkgname]:
+            versions[update.pkgname].append(update.newversion)
+    return versions
+
+
+def build_db(source, repos, stages=None):
+    del repos
+    if stages is None:
+        stages = Stages('updates')
+    with stages.stage('reading updates'):
+        with load() as raw:
+            versions = upstream_versions(parse(raw))
+    with stages.stage('saving updates'):
+        source.update_many(
+            ['pkgname'],
+            ['upstreamver'],
+            (
+                (pkgname, ' '.join(newversions))
+                for pkgname, newversions in versions.items()
+            )
         )
 
 
+def main(*args):
+    stages = Stages('updates')
+    datasource.update(lambda x: build_db(x, args, stages), stages)
+    stages.report()
+
+
 if __name__ == '__main__':
-    datasource.update(lambda x: build_db(x, sys.argv[1:]))
+    main(*sys.argv[1:])
@@ -16,6 +16,7 @@
 import sys
 from collections import Counter, OrderedDict, defaultdict
 from itertools import chain
+from urllib.parse import urlencode
 
 import humanize
 
@@ -176,9 +177,9 @@ def separate_repository(row):
     return None
 
 
-def make_pkg(row):
-    pkg = datasource.from_json(row.templatedata)
-    pkg.update(datasource.from_json(row.repodata))
+def make_pkg(row, properties):
+    pkg = dict(properties)
+    pkg['pkgver'] = row.pkgver
     pkg['verrev'] = verrev_from_pkgver(pkg['pkgver'])
     pkg['version'] = version_from_verrev(pkg['verrev'])
     iset, libc = split_arch(row.arch)
@@ -220,7 +221,11 @@ def combine_fields(fields_dic, versions):
 
 def new_versions(binpkgs, upstream):
     packaged = set(i.version for i in binpkgs.all)
-    upstream = set(i for i in upstream if i)
+    upstream = set(
+        version
+        for versions in upstream
+        for version in versions.split()
+    )
     return upstream.difference(packaged)
 
 
@@ -251,16 +256,17 @@ def separate_fields(fields, separate):
     return separated
 
 
-def data_generator(pkgname, single):
+def data_generator(pkgname, single, source=None):
     binpkgs = Binpkgs()
-    source = datasource.factory()
+    if source is None:
+        source = datasource.factory()
     fields_dic = defaultdict(list)
     other_archs = False
-    for row in source.read(pkgname=pkgname):
+    for row, properties in source.read_properties(pkgname):
         if single and row.arch != single:
             other_archs = True
             continue
-        pkg = make_pkg(row)
+        pkg = make_pkg(row, properties)
         binpkgs.add(pkg['verrev'], iset=pkg['iset'], libc=pkg['libc'])
         fields_dic_append(fields_dic, pkg)
     if not binpkgs:
@@ -283,8 +289,8 @@ def data_generator(pkgname, single):
     }, other_archs, popularity_reports)
 
 
-def page_generator(pkgname, single=None):
-    found = data_generator(pkgname, single)
+def page_generator(pkgname, single=None, source=None):
+    found = data_generator(pkgname, single, source)
     parameters = found.parameters
     if not parameters:
         if not found.other:
@@ -307,13 +313,28 @@ def _update_time(source):
     )
 
 
-def _ago(source):
+# Stands for time passed since database update in pages kept longer
+# than this time stays the same, see fill_ago
+AGO_PLACEHOLDER = '\0ago\0'
+
+
+def _ago(source, ago=None):
     updated = _update_time(source)
-    ago = humanize.naturaltime(now() - updated)
+    if ago is None:
+        ago = humanize.naturaltime(now() - updated)
     updated_no_zone = updated.strftime('%Y-%m-%d %H:%M:%S')
     return f'{updated_no_zone} UTC ({ago})'
 
 
+def fill_ago(page):
+    '''Puts time passed since database update in place of AGO_PLACEHOLDER
+    in page rendered with it.'''
+    if AGO_PLACEHOLDER not in page:
+        return page
+    updated = _update_time(datasource.factory())
+    return page.replace(AGO_PLACEHOLDER, humanize.naturaltime(now() - updated))
+
+
 def list_all():
     source = datasource.factory()
     packages = source.list_all()
@@ -329,21 +350,45 @@ def list_all():
     return present.render_template('all.html', **parameters)
 
 
-def find(term, fields):
+# Count of found packages listed on single page
+FOUND_PER_PAGE = 100
+
+
+def _find_query(term, fields, page):
+    return urlencode([
+        ('term', term or ''),
+        *(('by', i) for i in fields),
+        ('page', page),
+    ])
+
+
+def find(term, fields, page=1):
     source = datasource.factory()
-    packages = source.search(term, fields)
+    packages = source.search(
+        term,
+        fields,
+        FOUND_PER_PAGE + 1,
+        (page - 1) * FOUND_PER_PAGE
+    )
     all_fields = source.search_fields()
     parameters = {
         'fields': all_fields,
         'checked': fields or all_fields,
         'term': term,
+        'previous_page': None,
+        'next_page': None,
     }
     if isinstance(packages, str):
         parameters['packages'] = []
         parameters['error'] = packages
     else:
-        parameters['packages'] = list(packages)
+        packages = list(packages)
+        parameters['packages'] = packages[:FOUND_PER_PAGE]
         parameters['error'] = None
+        if page > 1:
+            parameters['previous_page'] = _find_query(term, fields, page - 1)
+        if len(packages) > FOUND_PER_PAGE:
+            parameters['next_page'] = _find_query(term, fields, page + 1)
     return present.render_template('find.html', **parameters)
 
 
@@ -393,8 +438,9 @@ class Collection:
         return self._pkgname
 
 
-def metapackages():
-    source = datasource.factory()
+def metapackages(source=None):
+    if source is None:
+        source = datasource.factory()
     packages = [Collection(i) for i in source.metapackages()]
     parameters = {
         'title': 'Package sets',
@@ -406,19 +452,20 @@ def metapackages():
     return present.render_template('list.html', **parameters)
 
 
-def newest():
+def newest(ago=None):
     source = datasource.factory()
     packages = source.newest(70)
     parameters = {
         'title': 'Newest packages',
-        'subtitle': f'by {_ago(source)}',
+        'subtitle': f'by {_ago(source, ago)}',
         'packages': packages,
     }
     return present.render_template('list.html', **parameters)
 
 
-def longest_names():
-    source = datasource.factory()
+def longest_names(source=None):
+    if source is None:
+        source = datasource.factory()
     packages = source.longest_names(100)
     parameters = {
         'title': 'Packages with longest names',
@@ -427,7 +474,7 @@ def longest_names():
     return present.render_template('list.html', **parameters)
 
 
-def main_page():
+def main_page(ago=None):
     source = datasource.factory()
     lists = [
         {
@@ -461,14 +508,15 @@ def main_page():
     ]
     parameters = {
         'title': 'Packages',
-        'updated': _ago(source),
+        'updated': _ago(source, ago),
         'lists': lists,
     }
     return present.render_template('main.html', **parameters)
 
 
-def popular():
-    source = datasource.factory()
+def popular(source=None):
+    if source is None:
+        source = datasource.factory()
     packages = source.popular(70)
     parameters = {
         'title': 'Most popular packages',